@@ -0,0 +1,67 @@
+import logging
+import timeit
+from django.contrib.gis.geoip2 import GeoIP2
+from django.core.management.base import BaseCommand
+from addresses.utils import get_country_code, get_geoip
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+# Public IP addresses of well-known DNS resolvers.
+IP_ADDRESSES = ('8.8.8.8', '1.1.1.1', '9.9.9.9', '208.67.222.222')
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Compares the per-lookup cost of geolocating an IP address with a new '
+        'GeoIP2 reader, the shared reader and the cached lookup.'
+    )
+
+    def add_arguments(self, parser):
+        '''
+        Set up command line arguments for the management command.
+        '''
+        parser.add_argument(
+            '-n', '--number', type=int, dest='number', default=1000,
+            help='Number of lookups to time for each method.'
+        )
+
+
+    def handle(self, *args, **options):
+        '''
+        Handle management command processing.
+        '''
+        logger.info('Processing \'benchmark_geoip\' management command...')
+
+        number = options['number']
+        ip_addresses = [
+            IP_ADDRESSES[i % len(IP_ADDRESSES)] for i in range(number)
+        ]
+
+        def per_request_reader():
+            for ip_address in ip_addresses:
+                GeoIP2().country(ip_address)
+
+        def shared_reader():
+            geoip = get_geoip()
+            for ip_address in ip_addresses:
+                geoip.country(ip_address)
+
+        def cached_lookup():
+            for ip_address in ip_addresses:
+                get_country_code(ip_address)
+
+        # Open the shared reader and warm the lookup cache.
+        cached_lookup()
+
+        for name, benchmark in (
+            ('GeoIP2() per request', per_request_reader),
+            ('Shared reader', shared_reader),
+            ('Cached lookup', cached_lookup)):
+            elapsed = timeit.timeit(benchmark, number=1)
+            self.stdout.write(
+                '%s: %.2f us per lookup' % (name, elapsed / number * 1e6)
+            )
+
+        logger.info('Processed \'benchmark_geoip\' management command.')
@@ -2,6 +2,7 @@ from unittest.mock import patch
 from django.http import HttpRequest
 from django.test import TestCase
 from ..forms import AddressForm
+from ..utils import get_country_code
 from ..views import AddressFormView
 
 
@@ -22,7 +23,7 @@ class AddressFormViewTest(TestCase):
 
 
     @patch('addresses.views.get_real_ip')
-    @patch('addresses.views.GeoIP2.country')
+    @patch('addresses.utils.GeoIP2.country')
     def test_unbound_form_defaults_to_users_country_if_ip_found(
         self, country_mock, get_real_ip_mock):
         '''
@@ -36,6 +37,7 @@ class AddressFormViewTest(TestCase):
         country_mock.return_value = {
             'country_name': 'United States', 'country_code': 'US'
         }
+        get_country_code.cache_clear()
 
         form = view.get_form()
 
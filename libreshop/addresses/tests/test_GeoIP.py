@@ -0,0 +1,58 @@
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.utils.six import StringIO
+from ..utils import get_country_code, get_geoip
+
+
+class GeoIPTest(SimpleTestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        get_country_code.cache_clear()
+
+
+    def test_reader_is_shared(self):
+        '''
+        Test that every lookup shares a single GeoIP2 reader.
+        '''
+        self.assertIs(get_geoip(), get_geoip())
+
+
+    @patch('addresses.utils.GeoIP2.country')
+    def test_lookups_are_cached(self, country_mock):
+        '''
+        Test that repeated lookups of an IP address are served from memory.
+        '''
+        country_mock.return_value = {
+            'country_name': 'United States', 'country_code': 'US'
+        }
+
+        country_codes = [get_country_code('8.8.8.8') for _ in range(3)]
+
+        self.assertEqual(country_codes, ['US', 'US', 'US'])
+        self.assertEqual(country_mock.call_count, 1)
+
+
+    def test_unknown_ip_address_has_no_country(self):
+        '''
+        Test that IP addresses missing from the GeoIP2 database are not
+        located, rather than raising an error.
+        '''
+        self.assertIsNone(get_country_code('127.0.0.1'))
+
+
+    def test_benchmark_command_reports_per_lookup_cost(self):
+        '''
+        Test that `./manage.py benchmark_geoip` reports the cost of each
+        lookup method.
+        '''
+        output = StringIO()
+
+        call_command('benchmark_geoip', stdout=output, number=10)
+
+        for name in (
+            'GeoIP2() per request', 'Shared reader', 'Cached lookup'):
+            self.assertIn('%s: ' % name, output.getvalue())
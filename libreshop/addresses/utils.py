@@ -0,0 +1,44 @@
+import logging
+import threading
+from functools import lru_cache
+from django.conf import settings
+from django.contrib.gis.geoip2 import GeoIP2, GeoIP2Exception
+from geoip2.errors import AddressNotFoundError
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+geoip_lock = threading.Lock()
+geoip = None
+
+
+def get_geoip():
+    '''
+    Get the process-wide GeoIP2 reader, opening the GeoLite2 database as a
+    memory-mapped file on first use. The reader is safe to share across
+    threads.
+    '''
+    global geoip
+
+    if geoip is None:
+        with geoip_lock:
+            if geoip is None:
+                logger.info('Opening GeoIP2 database...')
+                geoip = GeoIP2(cache=GeoIP2.MODE_MMAP)
+
+    return geoip
+
+
+@lru_cache(maxsize=settings.GEOIP_LOOKUP_CACHE_SIZE)
+def get_country_code(ip_address):
+    '''
+    Get the ISO 3166-1 country code associated to an IP address, or None if
+    the IP address cannot be located. Recent lookups are cached.
+    '''
+    try:
+        location = get_geoip().country(ip_address)
+    except (AddressNotFoundError, GeoIP2Exception) as e:
+        logger.debug('Unable to locate IP address (%s): %s' % (ip_address, e))
+        return None
+
+    return location['country_code']
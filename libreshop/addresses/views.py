@@ -1,8 +1,8 @@
 import logging
-from django.contrib.gis.geoip2 import GeoIP2
 from django.views.generic import FormView
 from ipware.ip import get_real_ip
 from .forms import AddressForm
+from .utils import get_country_code
 
 # Initialize logger.
 logger = logging.getLogger(__name__)
@@ -25,9 +25,9 @@ class AddressFormView(FormView):
 
         # Populate the form's `country` field with the user's apparent location.
         if ip_address and not form.is_bound:
-            geo_ip2 = GeoIP2()
-            location = geo_ip2.country(ip_address)
-            form.fields['country'].initial = location['country_code']
+            country_code = get_country_code(ip_address)
+            if country_code:
+                form.fields['country'].initial = country_code
 
         return form
 
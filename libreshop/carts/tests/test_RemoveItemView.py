@@ -1,14 +1,29 @@
+from decimal import Decimal
 from importlib import import_module
 from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.http import HttpRequest
 from django.test import TestCase
-from ..utils import SessionList
+from products.models import Product, Variant
+from ..utils import SessionCart
 from ..views import RemoveItemView
 
 # Create your tests here.
 class RemoveItemViewTest(TestCase):
 
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        product = Product.objects.create(name='foo', sku='123')
+        self.variant1 = Variant.objects.create(
+            product=product, name='bar', price=Decimal(12.34), sub_sku='456'
+        )
+        self.variant2 = Variant.objects.create(
+            product=product, name='baz', price=Decimal(43.21), sub_sku='789'
+        )
+
+
     def test_view_redirects_to_home_page_if_next_post_variable_is_not_set(self):
         '''
         Test that the view redirects to the Home Page, by default, as part of
@@ -44,14 +59,37 @@ class RemoveItemViewTest(TestCase):
         session_key = None
         request.session = engine.SessionStore(session_key)
         url = reverse('cart:remove')
-        session_list1 = SessionList(request.session, ['foo', 'bar'])
+        cart1 = SessionCart(request.session)
+        cart1.add(self.variant1)
+        cart1.add(self.variant2)
         request.POST['remove'] = '1'
 
         view = RemoveItemView()
         response = view.post(request)
 
-        session_list2 = SessionList(request.session)
-        self.assertEqual(session_list2, ['foo'])
+        cart2 = SessionCart(request.session)
+        self.assertEqual(cart2, [self.variant1])
+
+
+    def test_view_removes_one_unit_of_item_in_cart(self):
+        '''
+        Test that the view removes a single unit of the item within the cart at
+        the position contained in the 'remove' POST variable.
+        '''
+        request = HttpRequest()
+        engine = import_module(settings.SESSION_ENGINE)
+        session_key = None
+        request.session = engine.SessionStore(session_key)
+        cart1 = SessionCart(request.session)
+        cart1.add(self.variant1, quantity=3)
+        request.POST['remove'] = '0'
+
+        view = RemoveItemView()
+        response = view.post(request)
+
+        cart2 = SessionCart(request.session)
+        self.assertEqual(cart2, [self.variant1])
+        self.assertEqual(cart2[0].quantity, 2)
 
 
     def test_view_does_not_affect_cart_when_remove_post_variable_is_invalid(self):
@@ -64,11 +102,13 @@ class RemoveItemViewTest(TestCase):
         session_key = None
         request.session = engine.SessionStore(session_key)
         url = reverse('cart:remove')
-        session_list1 = SessionList(request.session, ['foo', 'bar'])
+        cart1 = SessionCart(request.session)
+        cart1.add(self.variant1)
+        cart1.add(self.variant2)
         request.POST['remove'] = '3'
 
         view = RemoveItemView()
         response = view.post(request)
 
-        session_list2 = SessionList(request.session)
-        self.assertEqual(session_list2, ['foo', 'bar'])
+        cart2 = SessionCart(request.session)
+        self.assertEqual(cart2, [self.variant1, self.variant2])
@@ -2,7 +2,7 @@ from decimal import Decimal
 from importlib import import_module
 from django.test import TestCase
 from products.models import Product, Variant
-from ..utils import SessionCart
+from ..utils import UUID, SessionCart
 
 # Create your tests here.
 class SessionCartTest(TestCase):
@@ -91,6 +91,83 @@ class SessionCartTest(TestCase):
         self.assertAlmostEqual(cart.total, Decimal(55.55), places=2)
 
 
+    def test_session_cart_can_calculate_total_price_of_quantities(self):
+        '''
+        Test that SessionCart multiplies the price of each item by its
+        quantity when calculating the total price.
+        '''
+        session = self.client.session
+        cart = SessionCart(session)
+
+        cart.add(self.variant, quantity=2)
+        cart.add(self.variant2)
+
+        self.assertAlmostEqual(cart.total, Decimal(67.89), places=2)
+        self.assertEqual(cart.quantity, 3)
+
+
+    def test_session_cart_stores_one_line_per_item(self):
+        '''
+        Test that SessionCart stores repeated items as a single line with a
+        quantity, in the order that items were first added.
+        '''
+        session = self.client.session
+        cart = SessionCart(session)
+
+        for i in range(20):
+            cart.add(self.variant)
+        cart.add(self.variant2)
+        cart2 = SessionCart(session)
+
+        self.assertEqual(
+            session[UUID], [[self.variant.pk, 20], [self.variant2.pk, 1]]
+        )
+        self.assertEqual(cart2, [self.variant, self.variant2])
+        self.assertEqual(cart2[0].quantity, 20)
+        self.assertEqual(len(cart2.units), 21)
+
+
+    def test_session_cart_migrates_carts_of_variant_pks(self):
+        '''
+        Test that SessionCart converts a cart stored as one Variant PK per
+        unit into lines of Variant PKs and quantities.
+        '''
+        session = self.client.session
+        session[UUID] = [self.variant2.pk, self.variant.pk, self.variant2.pk]
+
+        cart = SessionCart(session)
+
+        self.assertEqual(
+            session[UUID], [[self.variant2.pk, 2], [self.variant.pk, 1]]
+        )
+        self.assertEqual(cart, [self.variant2, self.variant])
+        self.assertAlmostEqual(cart.total, Decimal(98.76), places=2)
+
+
+    def test_session_cart_is_loaded_with_a_constant_number_of_queries(self):
+        '''
+        Test that SessionCart loads its items with a single query, regardless
+        of the number of items in the cart.
+        '''
+        product = Product.objects.create(name='bar', sku='456')
+
+        for size in (1, 10, 50):
+            session = self.client.session
+            cart = SessionCart(session)
+            for i in range(size):
+                cart.add(Variant.objects.create(
+                    product=product, name='%s-%s' % (size, i),
+                    price=Decimal(1.00), sub_sku='%s-%s' % (size, i)
+                ))
+
+            with self.assertNumQueries(1):
+                cart2 = SessionCart(session)
+                total = cart2.total
+
+            self.assertEqual(len(cart2), size)
+            cart.empty()
+
+
     def test_session_cart_preserves_contents_between_instantiations(self):
         '''
         Test that SessionCart preserves its contents between sessions.
@@ -118,6 +195,26 @@ class SessionCartTest(TestCase):
         self.assertEqual(cart, [self.variant])
 
 
+    def test_session_cart_removes_one_unit_of_an_item(self):
+        '''
+        Test that removing an item from a SessionCart decrements its quantity,
+        and only drops its line once no units remain.
+        '''
+        session = self.client.session
+        cart = SessionCart(session)
+
+        cart.add(self.variant, quantity=2)
+        cart.remove(self.variant)
+
+        self.assertEqual(cart, [self.variant])
+        self.assertEqual(cart[0].quantity, 1)
+
+        cart.remove(self.variant)
+
+        self.assertEqual(cart, [])
+        self.assertEqual(session[UUID], [])
+
+
     def test_session_cart_removes_items_that_become_unsalable(self):
         '''
         Test that SessionCart removes items that become unsalable between
@@ -1,4 +1,5 @@
 import logging
+from collections import OrderedDict
 from decimal import Decimal
 from functools import wraps
 from products.models import Variant
@@ -47,43 +48,121 @@ class SessionList(list):
 
 
 class SessionCart(list):
-
+    '''
+    The salable Variants in a Session's cart, one per line of the cart, in the
+    order that they were first added. The number of units of each line is set
+    as the `quantity` of its Variant. Within the Session, the cart is stored
+    as a SessionList of `[pk, quantity]` lines.
+    '''
     def __init__(self, session, *args, **kwargs):
 
         self._session_list = SessionList(session, *args, **kwargs)
-        # Map the PKs in the SessionList to their respective Variants and
-        # populate the SessionCart.
-        self += [
-            variant for pk in self._session_list
-            for variant in Variant.objects.filter(pk=pk) if variant.salable
-        ]
+        self._migrate_session_list()
+
+        # Map the lines in the SessionList to their respective Variants, with
+        # a single query, and populate the SessionCart.
+        variants = Variant.objects.select_related('product').in_bulk(
+            [pk for pk, quantity in self._session_list]
+        )
+        for pk, quantity in self._session_list:
+            variant = variants.get(pk)
+            if variant and variant.salable:
+                variant.quantity = quantity
+                super(SessionCart, self).append(variant)
 
-        # Remove Variant PKs from the SessionList if the Variant is no longer
+        # Remove lines from the SessionList if their Variant is no longer
         # salable or if it has been deleted from the database.
-        stale_items = [
-            pk for pk in self._session_list
-            if pk not in [item.pk for item in self]
+        stale_pks = (
+            {pk for pk, quantity in self._session_list} -
+            {item.pk for item in self}
+        )
+        if stale_pks:
+            self._session_list[:] = [
+                line for line in self._session_list
+                if line[0] not in stale_pks
+            ]
+
+
+    def _migrate_session_list(self):
+        '''
+        Convert a cart stored as one Variant PK per unit, as it was prior to
+        quantities, to lines of Variant PKs and quantities.
+        '''
+        if all(isinstance(line, list) for line in self._session_list):
+            return
+
+        quantities = OrderedDict()
+        for line in self._session_list:
+            pk, quantity = line if isinstance(line, list) else (line, 1)
+            quantities[pk] = quantities.get(pk, 0) + quantity
+
+        self._session_list[:] = [
+            [pk, quantity] for pk, quantity in quantities.items()
         ]
-        for pk in stale_items:
-            self._session_list.remove(pk)
+
+
+    def _get_line(self, item):
+        return next(
+            (line for line in self._session_list if line[0] == item.pk), None
+        )
 
 
     @property
     def total(self):
         return (
-            sum(item.price for item in self).quantize(Decimal(10) ** -2)
-            if self else Decimal(0.00)
+            sum(item.price * item.quantity for item in self).quantize(
+                Decimal(10) ** -2
+            ) if self else Decimal(0.00)
         )
 
 
-    def add(self, item):
-        self._session_list.append(item.pk)
-        super(SessionCart, self).append(item)
+    @property
+    def quantity(self):
+        '''
+        The number of units in the cart.
+        '''
+        return sum(item.quantity for item in self)
+
+
+    @property
+    def units(self):
+        '''
+        Every unit in the cart, repeating each Variant by its quantity.
+        '''
+        return [item for item in self for i in range(item.quantity)]
+
+
+    def add(self, item, quantity=1):
+        line = self._get_line(item)
+
+        if line:
+            line[1] += quantity
+            self._session_list._update_session()
+
+            cart_item = self[self.index(item)]
+            cart_item.quantity = line[1]
+        else:
+            self._session_list.append([item.pk, quantity])
 
+            item.quantity = quantity
+            super(SessionCart, self).append(item)
 
-    def remove(self, item):
-        self._session_list.remove(item.pk)
-        super(SessionCart, self).remove(item)
+
+    def remove(self, item, quantity=1):
+        line = self._get_line(item)
+        if not line:
+            raise ValueError('%s is not in the cart' % item)
+
+        cart_item = self[self.index(item)]
+
+        if line[1] > quantity:
+            line[1] -= quantity
+            self._session_list._update_session()
+
+            cart_item.quantity = line[1]
+        else:
+            self._session_list.remove(line)
+            super(SessionCart, self).remove(cart_item)
 
 
     def empty(self):
@@ -3,7 +3,7 @@ from django.core.urlresolvers import reverse
 from django.views.generic import View
 from django.shortcuts import redirect
 from products.models import Variant
-from .utils import SessionCart, SessionList
+from .utils import SessionCart
 
 # Initialize logger.
 logger = logging.getLogger(__name__)
@@ -15,14 +15,7 @@ class AddItemView(View):
         sku = request.POST.get('sku', None)
 
         if sku:
-            enabled_variants = Variant.objects.filter(
-                enabled=True, product__sku__istartswith=sku[0],
-                sub_sku__iendswith=sku[-1]
-            )
-            variant = next(
-                (_ for _ in enabled_variants if _.sku == sku),
-                None
-            )
+            variant = Variant.objects.get_by_sku(sku)
 
             if variant:
                 cart = SessionCart(request.session)
@@ -42,9 +35,9 @@ class RemoveItemView(View):
         index = request.POST.get('remove', None)
 
         if index:
-            cart = SessionList(request.session)
+            cart = SessionCart(request.session)
             try:
-                del cart[int(index)]
+                cart.remove(cart[int(index)])
             except IndexError as e:
                 pass
 
@@ -23,3 +23,16 @@ class Location(models.Model):
 class Warehouse(models.Model):
 
     name = models.CharField(max_length=8, unique=True)
+
+
+class CacheVersion(models.Model):
+    '''
+    A version number, shared by every process, of data that processes cache
+    in memory. Incrementing it invalidates every process's copy.
+    '''
+    name = models.CharField(max_length=64, primary_key=True)
+    version = models.PositiveIntegerField(default=0)
+
+
+    def __str__(self):
+        return '%s (v%s)' % (self.name, self.version)
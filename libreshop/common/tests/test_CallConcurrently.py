@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import TransactionTestCase
+from .. import utils
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+# Create your tests here.
+class CallConcurrentlyTest(TransactionTestCase):
+
+    def test_calls_share_one_pool_of_worker_threads(self):
+        '''
+        Test that call_concurrently submits calls to the module-level pool of
+        worker threads, rather than creating a pool per call.
+        '''
+        with patch.object(
+            utils, 'ThreadPoolExecutor', side_effect=AssertionError
+        ), patch.object(
+            utils.executor, 'submit', wraps=utils.executor.submit
+        ) as submit:
+            outcomes = utils.call_concurrently([
+                ('foo', lambda: 1), ('bar', lambda: 2)
+            ])
+
+        self.assertEqual(submit.call_count, 2)
+        self.assertEqual(
+            [outcome.result for outcome in outcomes.values()], [1, 2]
+        )
+
+
+    def test_calls_without_database_access_do_not_close_connections(self):
+        '''
+        Test that worker threads only release database connections opened by
+        calls that used the ORM.
+        '''
+        with patch.object(type(connections['default']), 'close') as close:
+            utils.call_concurrently([('foo', lambda: 1)])
+
+        self.assertFalse(close.called)
+
+        with patch.object(type(connections['default']), 'close') as close:
+            outcomes = utils.call_concurrently([
+                ('foo', lambda: User.objects.count())
+            ])
+
+        self.assertEqual(outcomes['foo'].result, 0)
+        self.assertTrue(close.called)
@@ -0,0 +1,104 @@
+import logging
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from django.db import connections
+from django.db.models import F
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+Outcome = namedtuple('Outcome', ['result', 'error', 'elapsed', 'timed_out'])
+
+# Share one pool of worker threads between all concurrent calls, sized so that
+# calls abandoned by earlier requests do not hold up those of later ones.
+MAX_WORKERS = 32
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+
+def call_concurrently(calls, timeout=None, deadline=None):
+    '''
+    Call each `(name, function)` pair of `calls` on a worker thread, waiting at
+    most `timeout` seconds (or `timeout[name]` seconds, if given a dict) for
+    any one call and at most `deadline` seconds for all of them. Return an
+    OrderedDict mapping each name, in call order, to an Outcome.
+
+    Calls that miss their cutoff are abandoned (they run to completion in the
+    background) and reported with `timed_out` set.
+    '''
+    def get_cutoff(name):
+        limit = timeout.get(name) if isinstance(timeout, dict) else timeout
+        limits = [_ for _ in (limit, deadline) if _ is not None]
+        return min(limits) if limits else None
+
+    def timed(function):
+        def wrapper():
+            started = time.time()
+            try:
+                return function(), None, time.time() - started
+            except Exception as e:
+                return None, e, time.time() - started
+            finally:
+                # Database connections are thread-local and worker threads
+                # outlive requests, so release any connection opened by this
+                # call once it is past CONN_MAX_AGE, as Django does at the end
+                # of each request. Calls that do not use the ORM have none.
+                for connection in connections.all():
+                    connection.close_if_unusable_or_obsolete()
+        return wrapper
+
+    outcomes = OrderedDict((name, None) for name, function in calls)
+    if not calls:
+        return outcomes
+
+    started = time.time()
+    futures = [
+        (get_cutoff(name), name, executor.submit(timed(function)))
+        for name, function in calls
+    ]
+
+    # Wait on the calls with the earliest cutoff first.
+    for cutoff, name, future in sorted(
+        futures, key=lambda _: float('inf') if _[0] is None else _[0]):
+        remaining = (
+            max(0, cutoff - (time.time() - started))
+            if cutoff is not None else None
+        )
+        try:
+            result, error, elapsed = future.result(timeout=remaining)
+        except TimeoutError:
+            future.cancel()
+            outcomes[name] = Outcome(None, None, time.time() - started, True)
+        else:
+            outcomes[name] = Outcome(result, error, elapsed, False)
+
+    return outcomes
+
+
+def get_cache_version(name):
+    '''
+    Return the version, shared by every process, of the cached data `name`.
+    '''
+    from .models import CacheVersion
+
+    version = CacheVersion.objects.filter(name=name).values_list(
+        'version', flat=True
+    ).first()
+
+    return version or 0
+
+
+def increment_cache_version(name):
+    '''
+    Invalidate the cached data `name` within every process.
+    '''
+    from .models import CacheVersion
+
+    updated = CacheVersion.objects.filter(name=name).update(
+        version=F('version') + 1
+    )
+    if not updated:
+        CacheVersion.objects.get_or_create(name=name)
+        CacheVersion.objects.filter(name=name).update(
+            version=F('version') + 1
+        )
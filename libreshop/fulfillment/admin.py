@@ -5,7 +5,7 @@ from common.forms import UniqueTogetherFormSet
 from .forms import SupplierCreationForm
 from .models import (
     Carrier, FulfillmentOrder, FulfillmentPurchase, FulfillmentSetting,
-    FulfillmentSettingValue, Shipment, Supplier
+    FulfillmentSettingValue, Shipment, ShippingRate, ShippingZone, Supplier
 )
 
 # Initialize logger
@@ -54,6 +54,19 @@ class SupplierAdmin(admin.ModelAdmin):
     form = SupplierCreationForm
 
 
+class ShippingRateInline(admin.TabularInline):
+    model = ShippingRate
+    fields = ('maximum_weight', 'rate')
+    formset = UniqueTogetherFormSet
+    extra = 0
+
+
+@admin.register(ShippingZone)
+class ShippingZoneAdmin(admin.ModelAdmin):
+    list_display = ('name', 'carrier', 'country', 'region', 'postal_code_prefix')
+    inlines = [ShippingRateInline]
+
+
 @admin.register(Shipment)
 class ShipmentAdmin(admin.ModelAdmin):
     list_display = (
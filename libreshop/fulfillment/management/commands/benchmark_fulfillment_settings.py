@@ -0,0 +1,91 @@
+import logging
+import timeit
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from fulfillment.models import FulfillmentSettingValue, parse_setting_value
+from products.models import Variant
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Compares the per-resolution cost of the fulfillment settings of a '
+        'Variant when parsing each value with literal_eval, when loading '
+        'pre-parsed (JSON) values, and when served from the cache.'
+    )
+
+    def add_arguments(self, parser):
+        '''
+        Set up command line arguments for the management command.
+        '''
+        parser.add_argument(
+            '-n', '--number', type=int, dest='number', default=1000,
+            help='Number of resolutions to time for each method.'
+        )
+        parser.add_argument(
+            '--variant', type=int, dest='variant', default=None,
+            help='PK of the Variant to resolve (defaults to the Variant with '
+                 'the most fulfillment settings).'
+        )
+
+
+    def handle(self, *args, **options):
+        '''
+        Handle management command processing.
+        '''
+        logger.info(
+            'Processing \'benchmark_fulfillment_settings\' management '
+            'command...'
+        )
+
+        number = options['number']
+        variants = Variant._base_manager.select_related('product')
+        if options['variant']:
+            variant = variants.filter(pk=options['variant']).first()
+        else:
+            variant = max(variants, default=None, key=lambda variant: (
+                FulfillmentSettingValue.objects.filter(
+                    Q(product=variant.product_id) | Q(variant=variant.pk)
+                ).count()
+            ))
+        if not variant:
+            raise CommandError('No Variant to resolve settings of.')
+
+        setting_values = list(FulfillmentSettingValue.objects.filter(
+            Q(product=variant.product_id) | Q(variant=variant.pk)
+        ))
+
+        # Both resolve the same rows, so that only the parse cost differs.
+        def literal_eval_values():
+            for setting_value in setting_values:
+                parse_setting_value(setting_value.value)
+
+        def pre_parsed_values():
+            for setting_value in setting_values:
+                setting_value.parsed_value
+
+        def cached_settings():
+            variant.fulfillment_settings
+
+        # Warm the cache.
+        cached_settings()
+
+        self.stdout.write(
+            'Resolving %s fulfillment setting(s) of %s.' %
+            (len(setting_values), variant)
+        )
+        for name, benchmark in (
+            ('literal_eval per access', literal_eval_values),
+            ('Pre-parsed (JSON)', pre_parsed_values),
+            ('Cached', cached_settings)):
+            elapsed = timeit.timeit(benchmark, number=number)
+            self.stdout.write(
+                '%s: %.2f us per resolution' % (name, elapsed / number * 1e6)
+            )
+
+        logger.info(
+            'Processed \'benchmark_fulfillment_settings\' management command.'
+        )
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2017-01-25 19:31
+from __future__ import unicode_literals
+
+import json
+import logging
+from ast import literal_eval
+from django.db import migrations, models
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+
+def parse_setting_value(value):
+    try:
+        return literal_eval(value)
+    except (ValueError, SyntaxError) as e:
+        return value
+
+
+def parse_setting_values(apps, schema_editor):
+    FulfillmentSettingValue = apps.get_model(
+        'fulfillment', 'FulfillmentSettingValue')
+    unparsed_values = []
+    for setting_value in FulfillmentSettingValue.objects.all():
+        parsed_value = parse_setting_value(setting_value.value)
+        try:
+            json_value = json.dumps(parsed_value)
+        except (TypeError, ValueError) as e:
+            json_value = None
+
+        if json_value is not None and json.loads(json_value) == parsed_value:
+            setting_value._value = json_value
+            setting_value.save(update_fields=['_value'])
+        else:
+            unparsed_values.append(setting_value)
+
+    # Values that JSON cannot represent faithfully keep being parsed whenever
+    # they are read, and have to be corrected before they can be edited.
+    for setting_value in unparsed_values:
+        logger.warning(
+            'FulfillmentSettingValue %s (%r) cannot be represented as JSON '
+            'and should be corrected.' % (setting_value.pk, setting_value.value)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fulfillment', '0019_auto_20161024_1906'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fulfillmentsettingvalue',
+            name='_value',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(parse_setting_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2017-01-26 16:40
+from __future__ import unicode_literals
+
+from decimal import Decimal
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import django_countries.fields
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fulfillment', '0020_fulfillmentsettingvalue__value'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShippingZone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('name', models.CharField(max_length=64)),
+                ('country', django_countries.fields.CountryField(max_length=2)),
+                ('region', models.CharField(blank=True, max_length=16, null=True)),
+                ('postal_code_prefix', models.CharField(blank=True, max_length=16, null=True)),
+                ('carrier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='fulfillment.Carrier')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ShippingRate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('maximum_weight', models.DecimalField(decimal_places=2, max_digits=8, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))])),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=8, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))])),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='fulfillment.ShippingZone')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='shippingzone',
+            unique_together=set([('carrier', 'name')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='shippingrate',
+            unique_together=set([('zone', 'maximum_weight')]),
+        ),
+    ]
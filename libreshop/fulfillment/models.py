@@ -1,21 +1,37 @@
 import importlib
+import json
 import logging
+from ast import literal_eval
 from decimal import Decimal
 from random import randrange
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.core.mail import EmailMessage
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 from django.template import Context, Engine
 from django.utils import timezone
 from model_utils.models import TimeStampedModel
 from orders.models import Communication
+from django_countries.fields import CountryField
 from django_measurement.models import MeasurementField
 from measurement.measures import Weight
 
 # Initialize logger.
 logger = logging.getLogger(__name__)
 
+def parse_setting_value(value):
+    '''
+    Parse a setting value, given as a Python literal, treating values that are
+    not literals as plain strings.
+    '''
+    try:
+        return literal_eval(value)
+    except (ValueError, SyntaxError) as e:
+        return value
+
+
 # Create your models here.
 class Supplier(TimeStampedModel):
 
@@ -67,6 +83,50 @@ class FulfillmentSettingValue(TimeStampedModel):
     product = models.ForeignKey('products.Product', null=True, blank=True)
     variant = models.ForeignKey('products.Variant', null=True, blank=True)
     value = models.CharField(max_length=128, null=True, blank=True)
+    _value = models.TextField(null=True, blank=True, editable=False)
+
+
+    @property
+    def parsed_value(self):
+        '''
+        Return the value, as parsed when the setting was saved.
+        '''
+        return (
+            json.loads(self._value) if self._value is not None else
+            parse_setting_value(self.value)
+        )
+
+
+    def serialize_value(self):
+        '''
+        Return the JSON representation of the parsed value, or None if JSON
+        cannot represent it faithfully (e.g. tuples, sets, or non-string dict
+        keys).
+        '''
+        parsed_value = parse_setting_value(self.value)
+        try:
+            json_value = json.dumps(parsed_value)
+        except (TypeError, ValueError) as e:
+            return None
+
+        return json_value if json.loads(json_value) == parsed_value else None
+
+
+    def clean(self):
+        super(FulfillmentSettingValue, self).clean()
+
+        if self.serialize_value() is None:
+            raise ValidationError({
+                'value': ['Value cannot be represented as JSON',],
+            })
+
+
+    def save(self, *args, **kwargs):
+        # Parse the value once, at write time, into its JSON representation.
+        # Values that JSON cannot represent (rejected by forms, but possibly
+        # saved before) are parsed whenever they are read instead.
+        self._value = self.serialize_value()
+        super(FulfillmentSettingValue, self).save(*args, **kwargs)
 
 
 class FulfillmentOrder(TimeStampedModel):
@@ -163,6 +223,50 @@ class Carrier(TimeStampedModel):
         return self.name
 
 
+class ShippingZone(TimeStampedModel):
+    '''
+    A destination, within a Carrier's table of shipping rates, matching a
+    country and optionally a region and postal code prefix.
+    '''
+    carrier = models.ForeignKey('Carrier', null=False, blank=False)
+    name = models.CharField(max_length=64, null=False, blank=False)
+    country = CountryField(null=False, blank=False)
+    region = models.CharField(max_length=16, null=True, blank=True)
+    postal_code_prefix = models.CharField(max_length=16, null=True, blank=True)
+
+    class Meta:
+        unique_together = ('carrier', 'name')
+
+    def __str__(self):
+        return '%s %s' % (self.carrier, self.name)
+
+
+class ShippingRate(TimeStampedModel):
+    '''
+    The rate of shipping a parcel weighing up to `maximum_weight` (in units of
+    the Carrier's preferred unit of measure) to a ShippingZone.
+    '''
+    zone = models.ForeignKey(
+        'ShippingZone', null=False, blank=False, related_name='rates'
+    )
+    maximum_weight = models.DecimalField(
+        max_digits=8, decimal_places=2, null=False, blank=False,
+        validators=[MinValueValidator(Decimal('0.00'))]
+    )
+    rate = models.DecimalField(
+        max_digits=8, decimal_places=2, null=False, blank=False,
+        validators=[MinValueValidator(Decimal('0.00'))]
+    )
+
+    class Meta:
+        unique_together = ('zone', 'maximum_weight')
+
+    def __str__(self):
+        return '%s up to %s %s' % (
+            self.zone, self.maximum_weight, self.zone.carrier.unit_of_measure
+        )
+
+
 def get_token(token=None):
     generate = lambda: '{:08x}'.format(randrange(2**32))
     if not token:
@@ -273,3 +377,33 @@ class Shipment(TimeStampedModel):
         return (
             bool(len(email_addresses)) and (emails_sent == len(email_addresses))
         )
+
+
+def invalidate_fulfillment_settings(sender, instance, **kwargs):
+    from products.models import Variant
+
+    variant_pks = [instance.variant_id] if instance.variant_id else []
+    if instance.product_id:
+        variant_pks += Variant.objects.filter(
+            product=instance.product_id
+        ).values_list('pk', flat=True)
+
+    Variant.invalidate_fulfillment_settings(variant_pks)
+
+
+def invalidate_shipping_rate_table(sender, instance, **kwargs):
+    from .utils import ShippingRateTable
+
+    ShippingRateTable.invalidate()
+
+
+post_save.connect(invalidate_fulfillment_settings,
+    sender=FulfillmentSettingValue)
+post_delete.connect(invalidate_fulfillment_settings,
+    sender=FulfillmentSettingValue)
+post_save.connect(invalidate_shipping_rate_table, sender=Carrier)
+post_delete.connect(invalidate_shipping_rate_table, sender=Carrier)
+post_save.connect(invalidate_shipping_rate_table, sender=ShippingZone)
+post_delete.connect(invalidate_shipping_rate_table, sender=ShippingZone)
+post_save.connect(invalidate_shipping_rate_table, sender=ShippingRate)
+post_delete.connect(invalidate_shipping_rate_table, sender=ShippingRate)
@@ -0,0 +1,4 @@
+'''
+Stub fulfillment backends, with injectable delays and barriers, for exercising code that
+fans out to the modules listed in `settings.FULFILLMENT_BACKENDS`.
+'''
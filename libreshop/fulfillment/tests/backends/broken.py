@@ -0,0 +1,6 @@
+def get_quote(variant):
+    raise KeyError('quote')
+
+
+def get_shipping_rate(*args, **kwargs):
+    raise KeyError('rate')
@@ -0,0 +1,23 @@
+import time
+from decimal import Decimal
+
+# Barrier (e.g. a `threading.Barrier`) to wait on, and seconds to sleep,
+# before responding.
+BARRIER = None
+DELAY = 0
+QUOTE = Decimal('2.00')
+RATE = Decimal('3.00')
+
+
+def get_quote(variant):
+    if BARRIER:
+        BARRIER.wait()
+    time.sleep(DELAY)
+    return QUOTE
+
+
+def get_shipping_rate(*args, **kwargs):
+    if BARRIER:
+        BARRIER.wait()
+    time.sleep(DELAY)
+    return RATE
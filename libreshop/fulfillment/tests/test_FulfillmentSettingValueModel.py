@@ -0,0 +1,92 @@
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+from products.models import Product
+from ..models import FulfillmentSetting, FulfillmentSettingValue, Supplier
+
+# Create your tests here.
+class FulfillmentSettingValueModelTest(TestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        # Set up test data.
+        self.product = Product.objects.create(name='foo', sku='123')
+        supplier = Supplier.objects.create(
+            name='foo',
+            fulfillment_backend='django.core.mail.backends.locmem.EmailBackend'
+        )
+        self.setting = FulfillmentSetting.objects.create(
+            supplier=supplier, name='bar'
+        )
+
+
+    def test_model_parses_literal_value_when_saved(self):
+        '''
+        Test that a Python literal value is parsed into its JSON representation
+        when the FulfillmentSettingValue is saved.
+        '''
+        setting_value = FulfillmentSettingValue.objects.create(
+            setting=self.setting, product=self.product, value="{'foo': 1}"
+        )
+        setting_value = FulfillmentSettingValue.objects.get(pk=setting_value.pk)
+
+        self.assertEqual(setting_value._value, '{"foo": 1}')
+        self.assertEqual(setting_value.parsed_value, {'foo': 1})
+
+
+    def test_model_treats_non_literal_value_as_string(self):
+        '''
+        Test that a value that is not a Python literal is treated as a string.
+        '''
+        setting_value = FulfillmentSettingValue.objects.create(
+            setting=self.setting, product=self.product, value='foo@example.com'
+        )
+
+        self.assertEqual(setting_value.parsed_value, 'foo@example.com')
+
+
+    def test_model_rejects_value_that_json_cannot_represent(self):
+        '''
+        Test that a value which would change in its JSON representation fails
+        validation instead of being silently converted.
+        '''
+        for value in ("(1, 2)", "{1: 'foo'}", "{'foo', 'bar'}", "b'foo'"):
+            setting_value = FulfillmentSettingValue(
+                setting=self.setting, product=self.product, value=value
+            )
+
+            self.assertRaises(ValidationError, setting_value.full_clean)
+
+
+    def test_model_saves_value_that_json_cannot_represent_unparsed(self):
+        '''
+        Test that a (legacy) value which JSON cannot represent can still be
+        saved, and is parsed whenever it is read.
+        '''
+        setting_value = FulfillmentSettingValue.objects.create(
+            setting=self.setting, product=self.product, value="(1, 2)"
+        )
+        setting_value = FulfillmentSettingValue.objects.get(pk=setting_value.pk)
+
+        self.assertIsNone(setting_value._value)
+        self.assertEqual(setting_value.parsed_value, (1, 2))
+
+
+    def test_benchmark_command_reports_per_resolution_cost(self):
+        '''
+        Test that `./manage.py benchmark_fulfillment_settings` reports the cost
+        of resolving settings with literal_eval, pre-parsed and cached.
+        '''
+        FulfillmentSettingValue.objects.create(
+            setting=self.setting, product=self.product, value="{'foo': 1}"
+        )
+        output = StringIO()
+
+        call_command('benchmark_fulfillment_settings', stdout=output, number=10)
+
+        self.assertIn('Resolving 1 fulfillment setting(s)', output.getvalue())
+        for name in ('literal_eval per access', 'Pre-parsed (JSON)', 'Cached'):
+            self.assertIn('%s: ' % name, output.getvalue())
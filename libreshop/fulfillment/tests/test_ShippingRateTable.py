@@ -0,0 +1,123 @@
+from decimal import Decimal
+from django.db.models import F
+from django.test import TestCase
+from common.models import CacheVersion
+from ..models import Carrier, ShippingRate, ShippingZone
+from ..utils import SHIPPING_RATE_TABLE_VERSION, ShippingRateTable
+
+
+class ShippingRateTableTest(TestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        # Set up test data.
+        self.carrier = Carrier.objects.create(name='foo', unit_of_measure='oz')
+        country_zone = ShippingZone.objects.create(
+            carrier=self.carrier, name='US', country='US'
+        )
+        region_zone = ShippingZone.objects.create(
+            carrier=self.carrier, name='VA', country='US', region='VA'
+        )
+        postal_code_zone = ShippingZone.objects.create(
+            carrier=self.carrier, name='Arlington', country='US', region='VA',
+            postal_code_prefix='222'
+        )
+        for zone, rate in (
+            (country_zone, 8), (region_zone, 6), (postal_code_zone, 4)):
+            ShippingRate.objects.create(
+                zone=zone, maximum_weight=Decimal(16), rate=Decimal(rate)
+            )
+            ShippingRate.objects.create(
+                zone=zone, maximum_weight=Decimal(32), rate=Decimal(rate * 2)
+            )
+
+        self.table = ShippingRateTable()
+        self.address = {'country': 'US', 'region': 'VA', 'postal_code': '22202'}
+
+
+    def test_table_quotes_from_most_specific_zone(self):
+        '''
+        Test that the ShippingRateTable quotes from the ShippingZone that most
+        specifically matches the destination.
+        '''
+        quotes = [
+            self.table.quote(dict(self.address, **address), 100)
+            for address in (
+                {}, {'postal_code': '23219'}, {'region': 'NY'},
+                {'country': 'CA'}
+            )
+        ]
+
+        self.assertEqual(quotes, [Decimal(4), Decimal(6), Decimal(8), None])
+
+
+    def test_table_quotes_by_weight_bracket(self):
+        '''
+        Test that the ShippingRateTable quotes the lightest weight bracket
+        that fits the parcel, in the Carrier's unit of measure.
+        '''
+        # 16 oz is about 453.6 g.
+        quotes = [
+            self.table.quote(self.address, weight)
+            for weight in (453, 454, 907, 908)
+        ]
+
+        self.assertEqual(quotes, [Decimal(4), Decimal(8), Decimal(8), None])
+
+
+    def test_table_quotes_lowest_rate_across_carriers(self):
+        '''
+        Test that the ShippingRateTable quotes the cheapest Carrier.
+        '''
+        carrier = Carrier.objects.create(name='bar', unit_of_measure='lb')
+        zone = ShippingZone.objects.create(
+            carrier=carrier, name='US', country='US'
+        )
+        ShippingRate.objects.create(
+            zone=zone, maximum_weight=Decimal(1), rate=Decimal(3)
+        )
+
+        self.assertEqual(self.table.quote(self.address, 100), Decimal(3))
+
+
+    def test_table_quotes_without_querying_the_database(self):
+        '''
+        Test that, once loaded, the ShippingRateTable quotes from memory and
+        only queries its version.
+        '''
+        self.table.quote(self.address, 100)
+
+        with self.assertNumQueries(1):
+            quote = self.table.quote(self.address, 100)
+
+        self.assertEqual(quote, Decimal(4))
+
+
+    def test_table_reloads_when_rates_change(self):
+        '''
+        Test that the ShippingRateTable reloads after a ShippingRate changes.
+        '''
+        self.table.quote(self.address, 100)
+
+        ShippingRate.objects.filter(rate=Decimal(4)).get().delete()
+
+        self.assertEqual(self.table.quote(self.address, 100), Decimal(8))
+
+
+    def test_table_reloads_when_invalidated_by_another_process(self):
+        '''
+        Test that the ShippingRateTable reloads once its version is changed in
+        the database, as by another process.
+        '''
+        self.table.quote(self.address, 100)
+
+        # Change a ShippingRate without sending signals, then bump the version
+        # directly, as another process would.
+        ShippingRate.objects.filter(rate=Decimal(4)).update(rate=Decimal(2))
+        CacheVersion.objects.filter(name=SHIPPING_RATE_TABLE_VERSION).update(
+            version=F('version') + 1
+        )
+
+        self.assertEqual(self.table.quote(self.address, 100), Decimal(2))
@@ -0,0 +1,101 @@
+import bisect
+import logging
+from collections import defaultdict
+from measurement.measures import Weight
+from common.utils import get_cache_version, increment_cache_version
+from .models import ShippingRate
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+SHIPPING_RATE_TABLE_VERSION = 'fulfillment.ShippingRateTable'
+
+
+class ShippingRateTable(object):
+    '''
+    An in-memory index of the table rates of every Carrier, by destination
+    country, for quoting shipping without calling carrier APIs. The index is
+    reloaded from the database whenever its CacheVersion changes.
+    '''
+    def __init__(self):
+        self.version = None
+        self.zones = {}
+
+
+    @staticmethod
+    def invalidate():
+        increment_cache_version(SHIPPING_RATE_TABLE_VERSION)
+
+
+    def get_version(self):
+        return get_cache_version(SHIPPING_RATE_TABLE_VERSION)
+
+
+    def load(self):
+        '''
+        Index ShippingRates by country, then by ShippingZone, with weight
+        brackets converted to grams and sorted in ascending order.
+        '''
+        version = self.get_version()
+
+        logger.info('Loading shipping rate table...')
+
+        brackets = defaultdict(list)
+        for rate in (
+            ShippingRate.objects.select_related('zone__carrier').
+            order_by('maximum_weight')):
+            unit = rate.zone.carrier.unit_of_measure
+            maximum_weight = Weight(**{unit: float(rate.maximum_weight)}).g
+            brackets[rate.zone].append((maximum_weight, rate.rate))
+
+        zones = defaultdict(list)
+        for zone, zone_brackets in brackets.items():
+            zones[str(zone.country)].append({
+                'carrier': zone.carrier.name,
+                'region': (zone.region or '').strip().upper(),
+                'postal_code_prefix': (
+                    (zone.postal_code_prefix or '').replace(' ', '').upper()
+                ),
+                'weights': [weight for weight, rate in zone_brackets],
+                'rates': [rate for weight, rate in zone_brackets],
+            })
+
+        self.zones, self.version = dict(zones), version
+
+        logger.info('Loaded shipping rate table (%s zones).' % len(brackets))
+
+
+    def quote(self, address, weight):
+        '''
+        Return the lowest rate, across Carriers, of shipping a parcel weighing
+        `weight` grams to `address`, or None if no table rate applies. Each
+        Carrier quotes from its most specific ShippingZone matching `address`.
+        '''
+        if self.version != self.get_version():
+            self.load()
+
+        country = (address.get('country') or '').strip().upper()
+        region = (address.get('region') or '').strip().upper()
+        postal_code = (
+            (address.get('postal_code') or '').replace(' ', '').upper()
+        )
+
+        carrier_zones = {}
+        for zone in self.zones.get(country, []):
+            if zone['region'] and zone['region'] != region:
+                continue
+            if not postal_code.startswith(zone['postal_code_prefix']):
+                continue
+
+            specificity = (len(zone['postal_code_prefix']), bool(zone['region']))
+            current_zone = carrier_zones.get(zone['carrier'])
+            if not current_zone or specificity > current_zone[0]:
+                carrier_zones[zone['carrier']] = (specificity, zone)
+
+        rates = []
+        for specificity, zone in carrier_zones.values():
+            index = bisect.bisect_left(zone['weights'], weight)
+            if index < len(zone['rates']):
+                rates.append(zone['rates'][index])
+
+        return min(rates) if rates else None
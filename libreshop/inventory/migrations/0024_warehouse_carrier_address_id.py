@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2017-01-25 18:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0023_auto_20161116_2011'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='warehouse',
+            name='carrier_address_id',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+    ]
@@ -10,6 +10,12 @@ class Warehouse(TimeStampedModel):
 
     name = models.CharField(max_length=64, unique=True, null=False, blank=False)
     address = models.OneToOneField('addresses.Address', null=False, blank=False)
+    # EasyPost ID of the verified Warehouse address, and a fingerprint of the
+    # address fields that were verified.
+    carrier_address_id = models.CharField(
+        max_length=64, null=True, blank=True, editable=False)
+    carrier_address_fingerprint = models.CharField(
+        max_length=64, null=True, blank=True, editable=False)
 
     def __str__(self):
         return 'Warehouse %s' % self.name
@@ -157,6 +157,24 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/1.9/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shipping_rates': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shipping_rates',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.8/topics/i18n/
 
@@ -251,9 +269,26 @@ DEFAULT_FROM_EMAIL = 'LibreShop <contact@libreshop.org>'
 
 GEOIP_PATH = os.path.join(BASE_DIR, 'libreshop/geolocation')
 
+# Set the number of IP address geolocations to keep in memory.
+GEOIP_LOOKUP_CACHE_SIZE = 4096
+
 # Declare carrier-calculated shipping APIs to integrate with.
 SHIPPING_APIS = ('foo',)
 
+# Set the number of seconds to wait on any one shipping rate source (optionally
+# a dict, keyed by source), and on all of them combined, during checkout.
+SHIPPING_RATE_TIMEOUT = 5
+SHIPPING_RATE_DEADLINE = 8
+
+# Set the country that parcels ship from, and the granularity (in ounces) at
+# which parcel weights share cached shipping rates.
+SHIPPING_ORIGIN_COUNTRY = 'US'
+SHIPPING_RATE_CACHE_WEIGHT_BUCKET = 4
+
+# Quote in-house shipments from the shipping rate table instead of EasyPost
+# ('primary'), only when EasyPost fails ('fallback'), or never (None).
+SHIPPING_RATE_TABLE = 'fallback'
+
 # Configure the Braintree environment.
 BT_MERCHANT_ID = os.environ.get('BT_MERCHANT_ID')
 BT_PUBLIC_KEY = os.environ.get('BT_PUBLIC_KEY')
@@ -264,6 +299,12 @@ braintree.Configuration.configure(braintree.Environment.Sandbox,
                                   public_key=BT_PUBLIC_KEY,
                                   private_key=BT_PRIVATE_KEY)
 
+# Keep a pool of Braintree client tokens, each served at most an hour after it
+# was generated, and refill it once fewer than 2 tokens remain.
+BRAINTREE_CLIENT_TOKEN_POOL_SIZE = 5
+BRAINTREE_CLIENT_TOKEN_POOL_LOW_WATER = 2
+BRAINTREE_CLIENT_TOKEN_MAX_AGE = 60 * 60
+
 BUSINESS_NAME = 'LibreShop'
 LEGAL_NAME = 'LibreShop, LLC'
 JURISDICTION = 'The United States'
@@ -275,3 +316,12 @@ MEDIA_URL = '/media/'
 FULFILLMENT_BACKENDS = [
     ('django.core.mail.backends.locmem.EmailBackend', 'Email')
 ]
+
+# Set the number of seconds to wait on any one fulfillment backend for a quote
+# (optionally a dict, keyed by backend), and on all of them combined.
+FULFILLMENT_QUOTE_TIMEOUT = 5
+FULFILLMENT_QUOTE_DEADLINE = 10
+
+# Set the number of seconds that a process may serve the fulfillment settings
+# of a Variant from its own cache, after they were changed in another process.
+FULFILLMENT_SETTINGS_CACHE_TIMEOUT = 5 * 60
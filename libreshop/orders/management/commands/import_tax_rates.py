@@ -0,0 +1,170 @@
+import csv
+import io
+import logging
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from orders.models import TaxRate
+from orders.utils import TaxRateIndex
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+JURISDICTION_FIELDS = ('state', 'district', 'county', 'city', 'postal_code')
+RATE_FIELDS = (
+    'state_tax_rate', 'district_tax_rate', 'county_tax_rate', 'local_tax_rate'
+)
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Imports TaxRates from a CSV file with a header row of: %s.' %
+        ', '.join(JURISDICTION_FIELDS + RATE_FIELDS)
+    )
+
+    def add_arguments(self, parser):
+        '''
+        Set up command line arguments for the management command.
+        '''
+        parser.add_argument('csv_file', type=str)
+        parser.add_argument(
+            '-b', '--batch-size', type=int, dest='batch_size', default=500,
+            help='Number of rows to upsert per batch.'
+        )
+
+
+    def parse_row(self, row):
+        '''
+        Split a CSV row into its jurisdiction (the unique key of a TaxRate)
+        and its tax rates. Blank jurisdiction fields are stored as empty
+        strings, as they are by forms.
+        '''
+        jurisdiction = tuple(
+            (row.get(field) or '').strip() for field in JURISDICTION_FIELDS
+        )
+        try:
+            rates = tuple(
+                Decimal((row.get(field) or '0').strip() or '0').
+                quantize(Decimal('0.0001'))
+                for field in RATE_FIELDS
+            )
+        except InvalidOperation as e:
+            raise CommandError('Invalid tax rate in row: %s' % row)
+
+        return jurisdiction, rates
+
+
+    def upsert(self, batch):
+        '''
+        Insert or update a batch of `{jurisdiction: rates}` with one query to
+        look up existing TaxRates, one to insert new ones and one per distinct
+        set of updated rates.
+        '''
+        postal_codes = {
+            jurisdiction[-1] for jurisdiction in batch if jurisdiction[-1]
+        }
+        query = Q(postal_code__in=postal_codes)
+        if any(not jurisdiction[-1] for jurisdiction in batch):
+            query |= Q(postal_code__isnull=True) | Q(postal_code='')
+
+        # Match TaxRates with NULL jurisdiction fields to blank CSV fields, so
+        # that they are updated rather than duplicated.
+        existing = {
+            tuple(value or '' for value in values[:len(JURISDICTION_FIELDS)]):
+            values[len(JURISDICTION_FIELDS):]
+            for values in TaxRate.objects.filter(query).values_list(
+                *(JURISDICTION_FIELDS + RATE_FIELDS + ('pk',))
+            )
+        }
+
+        new_tax_rates = []
+        updates = defaultdict(list)
+        unchanged = 0
+        for jurisdiction, rates in batch.items():
+            if jurisdiction not in existing:
+                new_tax_rates.append(TaxRate(**dict(
+                    zip(JURISDICTION_FIELDS + RATE_FIELDS, jurisdiction + rates)
+                )))
+                continue
+
+            existing_values = existing[jurisdiction]
+            existing_rates, pk = existing_values[:-1], existing_values[-1]
+            if tuple(existing_rates) == rates:
+                unchanged += 1
+            else:
+                updates[rates].append(pk)
+
+        TaxRate.objects.bulk_create(new_tax_rates)
+
+        now = timezone.now()
+        for rates, pks in updates.items():
+            TaxRate.objects.filter(pk__in=pks).update(
+                modified=now, **dict(zip(RATE_FIELDS, rates))
+            )
+
+        return (
+            len(new_tax_rates), sum(len(pks) for pks in updates.values()),
+            unchanged
+        )
+
+
+    def handle(self, *args, **options):
+        '''
+        Handle management command processing.
+        '''
+        logger.info('Processing \'import_tax_rates\' management command...')
+
+        csv_file = options['csv_file']
+        batch_size = options['batch_size']
+
+        inserted = updated = unchanged = 0
+        try:
+            with io.open(csv_file, newline='', encoding='utf-8') as f, \
+                transaction.atomic():
+                reader = csv.DictReader(f)
+
+                missing_fields = (
+                    set(JURISDICTION_FIELDS + RATE_FIELDS) -
+                    set(reader.fieldnames or [])
+                )
+                if missing_fields:
+                    raise CommandError(
+                        'CSV file is missing columns: %s' %
+                        ', '.join(sorted(missing_fields))
+                    )
+
+                batch = dict()
+                for row in reader:
+                    jurisdiction, rates = self.parse_row(row)
+                    batch[jurisdiction] = rates
+
+                    if len(batch) >= batch_size:
+                        counts = self.upsert(batch)
+                        inserted += counts[0]
+                        updated += counts[1]
+                        unchanged += counts[2]
+                        batch = dict()
+
+                if batch:
+                    counts = self.upsert(batch)
+                    inserted += counts[0]
+                    updated += counts[1]
+                    unchanged += counts[2]
+        except IOError as e:
+            raise CommandError('Unable to read \'%s\': %s' % (csv_file, e))
+
+        # Bulk queries do not send signals, so invalidate the TaxRateIndex of
+        # every process.
+        TaxRateIndex.invalidate()
+
+        message = (
+            'Imported tax rates: %s inserted, %s updated, %s unchanged.' %
+            (inserted, updated, unchanged)
+        )
+        self.stdout.write(self.style.SUCCESS(message))
+
+        logger.info('Processed \'import_tax_rates\' management command.')
@@ -1,6 +1,7 @@
 import logging
 from decimal import Decimal
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 from model_utils.models import TimeStampedModel
 
 # Initialize logger.
@@ -36,3 +37,13 @@ class TaxRate(TimeStampedModel):
     class Meta:
         verbose_name = 'Tax Rate'
         unique_together = ('state', 'district', 'county', 'city', 'postal_code')
+
+
+def invalidate_tax_rate_index(sender, instance, **kwargs):
+    from ..utils import TaxRateIndex
+
+    TaxRateIndex.invalidate()
+
+
+post_save.connect(invalidate_tax_rate_index, sender=TaxRate)
+post_delete.connect(invalidate_tax_rate_index, sender=TaxRate)
@@ -1,11 +1,15 @@
 import logging
+import time
 from decimal import Decimal
 from importlib import import_module
 from django.contrib.auth.models import AnonymousUser
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from orders.models import Order, Purchase, Transaction
+from addresses.utils import get_country_code
 from carts.utils import SessionCart
 from orders.models import Order, TaxRate
 from products.models import Product, Variant
@@ -55,6 +59,62 @@ class CheckoutFormViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+    @patch('braintree.ClientToken.generate')
+    def test_view_does_not_generate_client_token_for_shipping_step(
+        self, generate_mock):
+        '''
+        Test that the CheckoutFormView does not request a Braintree client
+        token until the payment form is rendered.
+        '''
+        response = self.client.get(self.view_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('client_token', response.context)
+        self.assertFalse(generate_mock.called)
+
+
+    def test_view_persists_orders_with_a_bounded_number_of_queries(self):
+        '''
+        Test that CheckoutFormView.create_order issues the same number of
+        queries for carts of 1, 10 and 100 Purchases.
+        '''
+        query_counts = []
+        for quantity in (1, 10, 100):
+            view = views.CheckoutFormView()
+            view.request = RequestFactory().post(self.view_url)
+            self.variant.quantity = quantity
+            view.cart = [self.variant]
+            view.shipping_address = {
+                'recipient_name': 'Foo Bar %s' % quantity,
+                'street_address': '123 Test St',
+                'locality': 'Test',
+                'region': 'OK',
+                'postal_code': '12345',
+                'country': 'US'
+            }
+            view.subtotal = view.total = self.variant.price * quantity
+            view.shipping_cost = view.sales_tax = Decimal(0.00)
+            payment_data = {
+                'transaction_id': '%08d' % quantity,
+                'amount': view.total,
+                'created_at': timezone.now(),
+                'authorized': True,
+            }
+
+            started = time.time()
+            with CaptureQueriesContext(connection) as context:
+                order = view.create_order(payment_data)
+            logger.info(
+                'Persisted Order of %s Purchases with %s queries in %.2fms.' %
+                (quantity, len(context), (time.time() - started) * 1000)
+            )
+
+            query_counts.append(len(context))
+            self.assertEqual(order.purchases.count(), quantity)
+
+        self.assertEqual(len(set(query_counts)), 1)
+
+
     def test_view_returns_200_status_if_variants_are_in_cart(self):
         '''
         Test that the CheckoutFormView returns a 200 OK status if there are
@@ -252,6 +312,77 @@ class CheckoutFormViewTest(TestCase):
         self.assertNotIn('shipping', self.client.session[views.UUID])
 
 
+    @patch.object(views.client_token_pool, 'get')
+    @patch('orders.views.calculate_shipping_cost')
+    def test_view_trusts_unchanged_session_data(
+        self, calculate_shipping_cost_mock, client_token_mock):
+        '''
+        Test that the View does not validate completed steps again while their
+        Session Data is unchanged.
+        '''
+        calculate_shipping_cost_mock.return_value = Decimal(1.00)
+        client_token_mock.return_value = 'foo'
+
+        session = self.client.session
+        cart = SessionCart(session)
+        cart.add(self.variant)
+        session.save()
+
+        request_data = {
+            'recipient_name': 'Foo Bar',
+            'street_address': '123 Test St',
+            'locality': 'Test',
+            'region': 'OK',
+            'postal_code': '12345',
+            'country': 'US'
+        }
+        self.client.post(self.view_url, data=request_data, follow=True)
+
+        with patch.object(views.AddressForm, 'is_valid') as is_valid_mock:
+            response = self.client.post(
+                self.view_url, data={}, follow=True
+            )
+
+        self.assertFalse(is_valid_mock.called)
+        self.assertIn('shipping', self.client.session[views.UUID])
+
+
+    @patch.object(views.client_token_pool, 'get')
+    @patch('orders.views.calculate_shipping_cost')
+    def test_view_detects_tampered_session_data(
+        self, calculate_shipping_cost_mock, client_token_mock):
+        '''
+        Test that the View validates completed steps again once their Session
+        Data no longer matches its digest.
+        '''
+        calculate_shipping_cost_mock.return_value = Decimal(1.00)
+        client_token_mock.return_value = 'foo'
+
+        session = self.client.session
+        cart = SessionCart(session)
+        cart.add(self.variant)
+        session.save()
+
+        request_data = {
+            'recipient_name': 'Foo Bar',
+            'street_address': '123 Test St',
+            'locality': 'Test',
+            'region': 'OK',
+            'postal_code': '12345',
+            'country': 'US'
+        }
+        self.client.post(self.view_url, data=request_data, follow=True)
+
+        # Tamper with the validated shipping address.
+        session = self.client.session
+        session[views.UUID]['shipping']['postal_code'] = '1234567890'
+        session.save()
+
+        response = self.client.post(self.view_url, data={}, follow=True)
+
+        self.assertNotIn('shipping', self.client.session[views.UUID])
+
+
     @patch.object(builtins, 'sum')
     @patch.object(views, 'settings')
     @patch('django.core.mail.backends.locmem.EmailBackend')
@@ -430,6 +561,136 @@ class CheckoutFormViewTest(TestCase):
         self.assertNotIn('shipping', self.client.session[views.UUID])
 
 
+    @patch('orders.views.calculate_shipping_cost')
+    def test_view_reuses_pricing_until_cart_or_address_changes(
+        self, calculate_shipping_cost_mock):
+        '''
+        Test that the CheckoutFormView memoizes pricing within the Session,
+        and only recalculates it once the cart or shipping address changes.
+        '''
+        calculate_shipping_cost_mock.return_value = Decimal(1.00)
+
+        session = self.client.session
+        cart = SessionCart(session)
+        cart.add(self.variant)
+        session.save()
+
+        request_data = {
+            'recipient_name': 'Foo Bar',
+            'street_address': '123 Test St',
+            'locality': 'Test',
+            'region': 'OK',
+            'postal_code': '12345',
+            'country': 'US'
+        }
+        self.client.post(self.view_url, data=request_data, follow=True)
+        self.client.get(self.view_url)
+        self.client.get(self.view_url)
+
+        self.assertEqual(calculate_shipping_cost_mock.call_count, 1)
+
+        # Change the price of the Variant in the cart.
+        self.variant.price = Decimal('23.45')
+        self.variant.save()
+        response = self.client.get(self.view_url)
+
+        self.assertEqual(calculate_shipping_cost_mock.call_count, 2)
+        self.assertEqual(response.context['total'], Decimal('24.45'))
+
+        # Go back and change the shipping address.
+        self.client.get(self.view_url, data={'shipping': 'shipping'})
+        request_data['postal_code'] = '54321'
+        self.client.post(self.view_url, data=request_data, follow=True)
+
+        self.assertEqual(calculate_shipping_cost_mock.call_count, 3)
+
+
+    @patch('orders.views.calculate_shipping_cost')
+    def test_view_recalculates_pricing_once_memoized_pricing_expires(
+        self, calculate_shipping_cost_mock):
+        '''
+        Test that the CheckoutFormView memoizes only the pricing it consumes,
+        and recalculates it once the memoized pricing is older than its
+        maximum age.
+        '''
+        calculate_shipping_cost_mock.return_value = Decimal(1.00)
+
+        session = self.client.session
+        cart = SessionCart(session)
+        cart.add(self.variant)
+        session.save()
+
+        request_data = {
+            'recipient_name': 'Foo Bar',
+            'street_address': '123 Test St',
+            'locality': 'Test',
+            'region': 'OK',
+            'postal_code': '12345',
+            'country': 'US'
+        }
+        with self.settings(CHECKOUT_PRICING_MAX_AGE=60):
+            self.client.post(self.view_url, data=request_data, follow=True)
+
+            pricing = self.client.session[views.PRICING_UUID]
+            self.assertEqual(
+                set(pricing),
+                {'fingerprint', 'calculated_at', 'shipping_cost', 'sales_tax'}
+            )
+
+            # Age the memoized pricing past its maximum age.
+            session = self.client.session
+            session[views.PRICING_UUID]['calculated_at'] = time.time() - 61
+            session.save()
+            self.client.get(self.view_url)
+
+            self.assertEqual(calculate_shipping_cost_mock.call_count, 2)
+
+            self.client.get(self.view_url)
+
+            self.assertEqual(calculate_shipping_cost_mock.call_count, 2)
+
+
+    @patch('orders.views.calculate_shipping_cost')
+    def test_view_recalculates_pricing_when_tax_or_shipping_rates_change(
+        self, calculate_shipping_cost_mock):
+        '''
+        Test that the CheckoutFormView recalculates memoized pricing once tax
+        rates or the shipping rate table change during checkout.
+        '''
+        calculate_shipping_cost_mock.return_value = Decimal(1.00)
+
+        session = self.client.session
+        cart = SessionCart(session)
+        cart.add(self.variant)
+        session.save()
+
+        request_data = {
+            'recipient_name': 'Foo Bar',
+            'street_address': '123 Test St',
+            'locality': 'Test',
+            'region': 'OK',
+            'postal_code': '12345',
+            'country': 'US'
+        }
+        self.client.post(self.view_url, data=request_data, follow=True)
+
+        self.assertEqual(calculate_shipping_cost_mock.call_count, 1)
+
+        TaxRate.objects.create(
+            city='Test', state='OK', postal_code='12345',
+            local_tax_rate=Decimal(0.01), state_tax_rate=Decimal(0.043)
+        )
+        response = self.client.get(self.view_url)
+
+        self.assertEqual(calculate_shipping_cost_mock.call_count, 2)
+        self.assertIn('sales tax', response.render().content.decode())
+
+        views.rate_table.invalidate()
+        self.client.get(self.view_url)
+
+        self.assertEqual(calculate_shipping_cost_mock.call_count, 3)
+
+
     @patch('orders.views.calculate_shipping_cost')
     def test_view_calculates_sales_tax_if_nexus_exists(self, calculate_shipping_cost_mock):
         '''
@@ -468,6 +729,44 @@ class CheckoutFormViewTest(TestCase):
         self.assertIn('sales tax', rendered_html)
 
 
+    @patch('orders.views.calculate_shipping_cost')
+    def test_view_applies_combined_tax_rate_of_postal_code(
+        self, calculate_shipping_cost_mock):
+        '''
+        Test that the CheckoutFormView applies the combined tax rate of the
+        User's postal code to the subtotal.
+        '''
+        calculate_shipping_cost_mock.return_value = Decimal(1.00)
+
+        rate = TaxRate.objects.create(
+            city='Test', state='OK', postal_code='12345',
+            local_tax_rate=Decimal('0.01'), state_tax_rate=Decimal('0.043')
+        )
+
+        session = self.client.session
+        cart = SessionCart(session)
+        cart.add(self.variant)
+        session.save()
+
+        # Set up HTTP POST request.
+        request_data = {
+            'recipient_name': 'Foo Bar',
+            'street_address': '123 Test St',
+            'locality': 'Test',
+            'region': 'OK',
+            'postal_code': '12345-6789',
+            'country': 'US'
+        }
+        response = self.client.post(
+            self.view_url,
+            data=request_data,
+            follow=True
+        )
+
+        # $12.34 at 5.3% is $0.654, rounded up.
+        self.assertEqual(response.context['sales_tax'], Decimal('0.66'))
+
+
     @patch('orders.views.calculate_shipping_cost')
     def test_view_d0es_not_calculate_sales_tax_if_no_nexus_exists(self, calculate_shipping_cost_mock):
         '''
@@ -505,7 +804,7 @@ class CheckoutFormViewTest(TestCase):
 
 
     @patch('orders.views.get_real_ip')
-    @patch('orders.views.GeoIP2.country')
+    @patch('addresses.utils.GeoIP2.country')
     def test_unbound_form_defaults_to_users_country_if_ip_found(
         self, country_mock, get_real_ip_mock):
         '''
@@ -516,6 +815,7 @@ class CheckoutFormViewTest(TestCase):
         country_mock.return_value = {
             'country_name': 'United States', 'country_code': 'US'
         }
+        get_country_code.cache_clear()
 
         response = self.client.get(self.view_url)
         response = response.render()
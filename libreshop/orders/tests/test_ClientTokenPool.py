@@ -0,0 +1,145 @@
+import itertools
+import threading
+import time
+from django.test import SimpleTestCase
+from ..utils import ClientTokenPool
+try:
+    # Try to import from the Python 3.3+ standard library.
+    from unittest.mock import patch
+except ImportError as e:
+    # Otherwise, import from the `mock` project dependency.
+    from mock import patch
+
+
+class GatewayStub(object):
+    '''
+    A local stand-in for the Braintree gateway, which issues numbered client
+    tokens after an optional delay.
+    '''
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.counter = itertools.count(1)
+        self.calls = 0
+
+
+    def generate(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return 'token-%s' % next(self.counter)
+
+
+class ClientTokenPoolTest(SimpleTestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        self.gateway = GatewayStub()
+        self.pool = ClientTokenPool(
+            generate=self.gateway.generate, size=3, max_age=60, low_water=2
+        )
+
+
+    def test_pool_generates_token_when_empty(self):
+        '''
+        Test that an empty ClientTokenPool generates a client token on demand,
+        then refills itself in the background.
+        '''
+        token = self.pool.get()
+        self.wait_for_refill()
+
+        self.assertEqual(token, 'token-1')
+        self.assertEqual(len(self.pool.tokens), 3)
+
+
+    def test_pool_serves_pregenerated_tokens(self):
+        '''
+        Test that a full ClientTokenPool serves each token once, without
+        waiting on the gateway.
+        '''
+        self.pool.refill()
+        self.gateway.delay = 1
+
+        started = time.time()
+        tokens = [self.pool.get(), self.pool.get()]
+        elapsed = time.time() - started
+
+        self.assertEqual(tokens, ['token-1', 'token-2'])
+        self.assertLess(elapsed, 0.5)
+
+
+    def test_pool_refills_only_below_low_water_mark(self):
+        '''
+        Test that the ClientTokenPool only starts a background refill once
+        fewer tokens than its low-water mark remain.
+        '''
+        self.pool.refill()
+
+        with patch.object(self.pool, 'refill_async') as refill_async_mock:
+            self.pool.get()
+            self.assertFalse(refill_async_mock.called)
+
+            self.pool.get()
+            self.assertEqual(refill_async_mock.call_count, 1)
+
+
+    def test_pool_runs_one_refill_at_a_time(self):
+        '''
+        Test that tokens served while a background refill is running do not
+        start another refill.
+        '''
+        released = threading.Event()
+
+        def generate():
+            released.wait(5)
+            return self.gateway.generate()
+
+        self.pool.generate = generate
+        self.pool.tokens.extend(
+            (token, time.time()) for token in ('token-a', 'token-b')
+        )
+
+        refill = self.pool.refill
+        with patch.object(self.pool, 'refill', wraps=refill) as refill_mock:
+            tokens = [self.pool.get(), self.pool.get()]
+            released.set()
+            self.wait_for_refill()
+
+        self.assertEqual(tokens, ['token-a', 'token-b'])
+        self.assertEqual(refill_mock.call_count, 1)
+        self.assertEqual(len(self.pool.tokens), 3)
+
+
+    def test_pool_discards_expired_tokens(self):
+        '''
+        Test that the ClientTokenPool never serves tokens older than its
+        maximum age.
+        '''
+        self.pool.refill()
+        self.pool.tokens = type(self.pool.tokens)(
+            (token, generated - 61) for token, generated in self.pool.tokens
+        )
+
+        token = self.pool.get()
+
+        self.assertEqual(token, 'token-4')
+
+
+    def test_pool_tolerates_gateway_errors(self):
+        '''
+        Test that background refills stop quietly when the gateway fails.
+        '''
+        def generate():
+            raise IOError('Gateway unavailable')
+
+        pool = ClientTokenPool(generate=generate, size=3, max_age=60)
+        pool.refill()
+
+        self.assertEqual(len(pool.tokens), 0)
+
+
+    def wait_for_refill(self):
+        for _ in range(100):
+            if not self.pool.refilling:
+                break
+            time.sleep(0.01)
@@ -0,0 +1,154 @@
+import os
+import tempfile
+from decimal import Decimal
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils.six import StringIO
+from ..models import TaxRate
+from ..utils import TaxRateIndex
+
+CSV_HEADER = (
+    'state,district,county,city,postal_code,'
+    'state_tax_rate,district_tax_rate,county_tax_rate,local_tax_rate\n'
+)
+
+
+class ImportTaxRatesCommandTest(TestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        # Set up string buffer to capture command output.
+        self.output = StringIO()
+
+        # Set up test data.
+        TaxRate.objects.create(
+            state='OK', city='Test', postal_code='12345',
+            state_tax_rate=Decimal('0.043'), local_tax_rate=Decimal('0.01')
+        )
+        TaxRate.objects.create(
+            state='OK', city='Other', postal_code='12346',
+            state_tax_rate=Decimal('0.043')
+        )
+
+
+    def write_csv(self, rows):
+        csv_file = tempfile.NamedTemporaryFile(
+            mode='w', suffix='.csv', delete=False
+        )
+        csv_file.write(CSV_HEADER + ''.join(row + '\n' for row in rows))
+        csv_file.close()
+        self.addCleanup(os.remove, csv_file.name)
+
+        return csv_file.name
+
+
+    def test_command_inserts_updates_and_reports_tax_rates(self):
+        '''
+        Test that `./manage.py import_tax_rates` inserts new jurisdictions,
+        updates changed rates and reports the counts of each.
+        '''
+        csv_file = self.write_csv([
+            'OK,,,Test,12345,0.043,0,0,0.01',
+            'OK,,,Other,12346,0.045,0,0,0',
+            'OK,,,New,12347,0.045,0,0,0.02',
+        ])
+
+        call_command(
+            'import_tax_rates', csv_file, stdout=self.output, batch_size=2
+        )
+
+        self.assertIn(
+            'Imported tax rates: 1 inserted, 1 updated, 1 unchanged.',
+            self.output.getvalue()
+        )
+        self.assertEqual(TaxRate.objects.count(), 3)
+        self.assertEqual(
+            TaxRate.objects.get(postal_code='12346').tax_rate,
+            Decimal('0.045')
+        )
+        self.assertEqual(
+            TaxRate.objects.get(postal_code='12347').tax_rate,
+            Decimal('0.065')
+        )
+
+
+    def test_command_matches_blank_and_null_jurisdiction_fields(self):
+        '''
+        Test that `./manage.py import_tax_rates` updates TaxRates whose blank
+        jurisdiction fields are stored as either NULL or empty strings, rather
+        than inserting duplicates.
+        '''
+        TaxRate.objects.create(
+            state='OK', district='', county='', city='Form',
+            postal_code='12348', state_tax_rate=Decimal('0.043')
+        )
+        csv_file = self.write_csv([
+            'OK,,,Test,12345,0.043,0,0,0.02',
+            'OK,,,Form,12348,0.045,0,0,0',
+            'OK,,,New,12349,0.045,0,0,0',
+        ])
+
+        call_command('import_tax_rates', csv_file, stdout=self.output)
+
+        self.assertIn(
+            'Imported tax rates: 1 inserted, 2 updated, 0 unchanged.',
+            self.output.getvalue()
+        )
+        self.assertEqual(TaxRate.objects.count(), 4)
+        self.assertEqual(TaxRate.objects.get(city='New').district, '')
+
+
+    def test_command_upserts_in_batches(self):
+        '''
+        Test that `./manage.py import_tax_rates` issues a constant number of
+        queries per batch, rather than per row.
+        '''
+        csv_file = self.write_csv([
+            'OK,,,City %s,%05d,0.045,0,0,0' % (i, 20000 + i)
+            for i in range(50)
+        ])
+
+        # Transaction savepoint & release, one lookup, one insert and one
+        # update of the TaxRateIndex version.
+        with self.assertNumQueries(5):
+            call_command(
+                'import_tax_rates', csv_file, stdout=self.output,
+                batch_size=50
+            )
+
+        self.assertEqual(TaxRate.objects.count(), 52)
+
+
+    def test_command_refreshes_tax_rate_index(self):
+        '''
+        Test that `./manage.py import_tax_rates` causes the TaxRateIndex to
+        reload imported rates.
+        '''
+        index = TaxRateIndex()
+        index.get('12345')
+        csv_file = self.write_csv(['OK,,,New,12347,0.045,0,0,0.02'])
+
+        call_command('import_tax_rates', csv_file, stdout=self.output)
+
+        self.assertEqual(index.get('12347'), Decimal('0.065'))
+
+
+    def test_command_rejects_csv_files_with_missing_columns(self):
+        '''
+        Test that `./manage.py import_tax_rates` refuses CSV files that do not
+        provide every TaxRate column.
+        '''
+        csv_file = tempfile.NamedTemporaryFile(
+            mode='w', suffix='.csv', delete=False
+        )
+        csv_file.write('state,postal_code\nOK,12345\n')
+        csv_file.close()
+        self.addCleanup(os.remove, csv_file.name)
+
+        self.assertRaises(
+            CommandError, call_command, 'import_tax_rates', csv_file.name,
+            stdout=self.output
+        )
@@ -0,0 +1,461 @@
+import threading
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from addresses.models import Address
+from fulfillment.models import Carrier, ShippingRate, ShippingZone
+from inventory.models import Warehouse
+from .. import views
+try:
+    # Try to import from the Python 3.3+ standard library.
+    from unittest.mock import Mock, patch
+except ImportError as e:
+    # Otherwise, import from the `mock` project dependency.
+    from mock import Mock, patch
+
+STUB_BACKENDS = [
+    ('fulfillment.tests.backends.fast', 'Fast'),
+    ('fulfillment.tests.backends.slow', 'Slow'),
+    ('fulfillment.tests.backends.broken', 'Broken'),
+]
+
+
+@override_settings(
+    FULFILLMENT_BACKENDS=STUB_BACKENDS,
+    SHIPPING_RATE_TIMEOUT=0.3,
+    SHIPPING_RATE_DEADLINE=1
+)
+class ShippingRatesTest(TestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        self.address = {
+            'country': 'US', 'region': 'VA', 'postal_code': '22202'
+        }
+        self.fast_product = Mock(pk=1, suppliers=['Fast'], weight=100.0)
+        self.slow_product = Mock(pk=2, suppliers=['Slow'], weight=100.0)
+        self.broken_product = Mock(pk=3, suppliers=['Broken'], weight=100.0)
+
+        views.rate_cache.clear()
+
+
+    @override_settings(SHIPPING_RATE_TIMEOUT=10, SHIPPING_RATE_DEADLINE=10)
+    @patch('fulfillment.tests.backends.slow.DELAY', 0)
+    @patch('orders.views.get_shipping_rate')
+    def test_shipping_rate_sources_are_queried_concurrently(
+        self, get_shipping_rate_mock):
+        '''
+        Test that calculate_shipping_cost queries rate sources concurrently, by
+        making each source wait until every other one has been queried as well.
+        '''
+        barrier = threading.Barrier(3, timeout=5)
+
+        def get_shipping_rate(*args):
+            barrier.wait()
+            return Decimal('5.00')
+
+        get_shipping_rate_mock.side_effect = get_shipping_rate
+        products = [
+            self.fast_product, self.slow_product,
+            Mock(suppliers=[], weight=100.0)
+        ]
+
+        with patch('fulfillment.tests.backends.fast.BARRIER', barrier), \
+            patch('fulfillment.tests.backends.slow.BARRIER', barrier):
+            shipping_cost = views.calculate_shipping_cost(
+                address=self.address, products=products
+            )
+
+        self.assertEqual(shipping_cost, Decimal('12.00'))
+        self.assertFalse(barrier.broken)
+
+
+    def test_shipping_rates_record_per_source_timing(self):
+        '''
+        Test that get_shipping_rates records how long each rate source took,
+        and does not query sources that ship none of the products.
+        '''
+        outcomes = views.get_shipping_rates(
+            address=self.address, products=[self.fast_product]
+        )
+
+        self.assertEqual(
+            list(outcomes.keys()), ['fulfillment.tests.backends.fast']
+        )
+        outcome = outcomes['fulfillment.tests.backends.fast']
+        self.assertEqual(outcome.result, Decimal('3.00'))
+        self.assertFalse(outcome.timed_out)
+        self.assertGreaterEqual(outcome.elapsed, 0)
+
+
+    def test_shipping_cost_leaves_out_a_source_that_times_out(self):
+        '''
+        Test that calculate_shipping_cost sums the rates of the sources that
+        answered when another rate source exceeds its latency budget.
+        '''
+        products = [self.fast_product, self.slow_product]
+
+        outcomes = views.get_shipping_rates(
+            address=self.address, products=products
+        )
+        shipping_cost = views.calculate_shipping_cost(
+            address=self.address, products=products
+        )
+
+        self.assertTrue(outcomes['fulfillment.tests.backends.slow'].timed_out)
+        self.assertEqual(shipping_cost, Decimal('3.00'))
+
+
+    def test_shipping_cost_leaves_out_a_source_that_fails(self):
+        '''
+        Test that calculate_shipping_cost sums the rates of the sources that
+        answered when another rate source raises an error.
+        '''
+        shipping_cost = views.calculate_shipping_cost(
+            address=self.address,
+            products=[self.fast_product, self.broken_product]
+        )
+
+        self.assertEqual(shipping_cost, Decimal('3.00'))
+
+
+    def test_shipping_cost_is_not_calculated_if_no_source_answers(self):
+        '''
+        Test that calculate_shipping_cost returns zero when every rate source
+        fails.
+        '''
+        shipping_cost = views.calculate_shipping_cost(
+            address=self.address, products=[self.broken_product]
+        )
+
+        self.assertEqual(shipping_cost, Decimal('0.00'))
+
+
+    @patch('orders.views.get_shipping_rate')
+    def test_shipping_rates_are_cached_by_destination_and_parcel(
+        self, get_shipping_rate_mock):
+        '''
+        Test that a repeated shipping rate request for a similar parcel to the
+        same normalized destination is served from the shipping rate cache.
+        '''
+        get_shipping_rate_mock.return_value = Decimal('5.00')
+        address = dict(self.address, postal_code='22202-4321', region='va')
+
+        views.calculate_shipping_cost(
+            address=self.address, products=[Mock(suppliers=[], weight=100.0)]
+        )
+        shipping_cost = views.calculate_shipping_cost(
+            address=address, products=[Mock(suppliers=[], weight=101.0)]
+        )
+
+        self.assertEqual(shipping_cost, Decimal('5.00'))
+        self.assertEqual(get_shipping_rate_mock.call_count, 1)
+        self.assertEqual(views.rate_cache.stats, {'hits': 1, 'misses': 1})
+
+
+    @patch('orders.views.get_shipping_rate')
+    def test_shipping_rates_are_not_shared_across_weight_buckets(
+        self, get_shipping_rate_mock):
+        '''
+        Test that parcels of a different weight bucket, or bound to another
+        destination, are quoted by the rate source again.
+        '''
+        get_shipping_rate_mock.return_value = Decimal('5.00')
+        address = dict(self.address, postal_code='10001', region='NY')
+
+        views.calculate_shipping_cost(
+            address=self.address, products=[Mock(suppliers=[], weight=100.0)]
+        )
+        views.calculate_shipping_cost(
+            address=self.address, products=[Mock(suppliers=[], weight=500.0)]
+        )
+        views.calculate_shipping_cost(
+            address=address, products=[Mock(suppliers=[], weight=100.0)]
+        )
+
+        self.assertEqual(get_shipping_rate_mock.call_count, 3)
+        self.assertEqual(views.rate_cache.stats, {'hits': 0, 'misses': 3})
+
+
+    def test_supplier_shipping_rates_are_not_shared_across_variants(self):
+        '''
+        Test that a supplier is asked again to quote a parcel of the same
+        weight to the same destination when it contains other Variants.
+        '''
+        other_product = Mock(pk=4, suppliers=['Fast'], weight=100.0)
+
+        views.calculate_shipping_cost(
+            address=self.address, products=[self.fast_product]
+        )
+        views.calculate_shipping_cost(
+            address=self.address, products=[other_product]
+        )
+        views.calculate_shipping_cost(
+            address=self.address, products=[self.fast_product]
+        )
+
+        self.assertEqual(views.rate_cache.stats, {'hits': 1, 'misses': 2})
+
+
+    def test_shipping_rate_cache_statistics_are_logged(self):
+        '''
+        Test that get_shipping_rates logs the shipping rate cache hit and miss
+        counters.
+        '''
+        with patch.object(views.logger, 'info') as info_mock:
+            views.get_shipping_rates(
+                address=self.address, products=[self.fast_product]
+            )
+
+        info_mock.assert_any_call('Shipping rate cache: 0 hit(s), 1 miss(es).')
+
+
+    def test_failed_shipping_rates_are_not_cached(self):
+        '''
+        Test that shipping rate sources that fail or time out are retried on
+        the next request.
+        '''
+        products = [self.fast_product, self.slow_product]
+
+        views.calculate_shipping_cost(address=self.address, products=products)
+        outcomes = views.get_shipping_rates(
+            address=self.address, products=products
+        )
+
+        self.assertEqual(views.rate_cache.stats, {'hits': 1, 'misses': 3})
+        self.assertTrue(outcomes['fulfillment.tests.backends.slow'].timed_out)
+
+
+
+    @patch('orders.views.get_shipping_rate')
+    def test_shipping_rate_table_is_used_as_primary_source(
+        self, get_shipping_rate_mock):
+        '''
+        Test that in-house shipments are quoted from the shipping rate table,
+        without calling EasyPost, when it is the primary rate source.
+        '''
+        self.create_shipping_rate_table()
+
+        with self.settings(SHIPPING_RATE_TABLE='primary'):
+            shipping_cost = views.calculate_shipping_cost(
+                address=self.address,
+                products=[Mock(suppliers=[], weight=100.0)]
+            )
+
+        self.assertEqual(shipping_cost, Decimal('4.00'))
+        self.assertFalse(get_shipping_rate_mock.called)
+
+
+    @patch('orders.views.get_shipping_rate')
+    def test_shipping_rate_table_is_used_as_fallback_source(
+        self, get_shipping_rate_mock):
+        '''
+        Test that in-house shipments are quoted from the shipping rate table
+        when EasyPost fails.
+        '''
+        get_shipping_rate_mock.side_effect = ValueError('EasyPost is down')
+        self.create_shipping_rate_table()
+
+        with self.settings(SHIPPING_RATE_TABLE='fallback'):
+            shipping_cost = views.calculate_shipping_cost(
+                address=self.address,
+                products=[Mock(suppliers=[], weight=100.0)]
+            )
+
+        self.assertEqual(shipping_cost, Decimal('4.00'))
+        self.assertTrue(get_shipping_rate_mock.called)
+
+
+    @patch.object(views.rate_table, 'quote')
+    @patch('orders.views.get_shipping_rate')
+    def test_shipping_rate_table_is_not_quoted_unless_needed(
+        self, get_shipping_rate_mock, quote_mock):
+        '''
+        Test that in-house shipments are not quoted from the shipping rate
+        table when it is only a fallback and EasyPost succeeds.
+        '''
+        get_shipping_rate_mock.return_value = Decimal('5.00')
+
+        with self.settings(SHIPPING_RATE_TABLE='fallback'):
+            shipping_cost = views.calculate_shipping_cost(
+                address=self.address,
+                products=[Mock(suppliers=[], weight=100.0)]
+            )
+
+        self.assertEqual(shipping_cost, Decimal('5.00'))
+        self.assertFalse(quote_mock.called)
+
+
+    def create_shipping_rate_table(self):
+        carrier = Carrier.objects.create(name='foo', unit_of_measure='lb')
+        zone = ShippingZone.objects.create(
+            carrier=carrier, name='US', country='US'
+        )
+        ShippingRate.objects.create(
+            zone=zone, maximum_weight=Decimal(1), rate=Decimal(4)
+        )
+
+class OriginAddressTest(TestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        address = Address.objects.create(
+            recipient_name='Foo Bar',
+            street_address='123 Test St',
+            locality='Test',
+            region='VA',
+            postal_code='22202',
+            country='US'
+        )
+        self.warehouse = Warehouse.objects.create(name='foo', address=address)
+
+
+    @patch('orders.views.create_address')
+    def test_origin_address_is_verified_once(self, create_address_mock):
+        '''
+        Test that the Warehouse address is verified by EasyPost only once, and
+        that its EasyPost ID is persisted for later shipping rate requests.
+        '''
+        create_address_mock.return_value = Mock(id='adr_123', country='US')
+
+        views.get_origin_address()
+        origin_address = views.get_origin_address()
+
+        self.assertEqual(create_address_mock.call_count, 1)
+        self.assertEqual(
+            create_address_mock.call_args[0][0]['street_address'],
+            '123 Test St'
+        )
+        self.assertEqual(origin_address.id, 'adr_123')
+        self.assertEqual(origin_address.country, 'US')
+        self.assertEqual(
+            Warehouse.objects.get(pk=self.warehouse.pk).carrier_address_id,
+            'adr_123'
+        )
+
+
+    @patch('orders.views.create_address')
+    def test_origin_address_is_not_persisted_if_verification_fails(
+        self, create_address_mock):
+        '''
+        Test that a Warehouse address is verified again when EasyPost could
+        not verify it previously.
+        '''
+        create_address_mock.return_value = None
+
+        views.get_origin_address()
+        views.get_origin_address()
+
+        self.assertEqual(create_address_mock.call_count, 2)
+        self.assertIsNone(
+            Warehouse.objects.get(pk=self.warehouse.pk).carrier_address_id
+        )
+
+
+    @patch('orders.views.create_address')
+    def test_origin_address_is_verified_again_when_edited_in_place(
+        self, create_address_mock):
+        '''
+        Test that a Warehouse address is verified again when its fields have
+        been edited since it was last verified.
+        '''
+        create_address_mock.side_effect = [
+            Mock(id='adr_123', country='US'), Mock(id='adr_456', country='US')
+        ]
+
+        views.get_origin_address()
+        Address.objects.filter(pk=self.warehouse.address_id).update(
+            postal_code='22203'
+        )
+        origin_address = views.get_origin_address()
+
+        self.assertEqual(create_address_mock.call_count, 2)
+        self.assertEqual(
+            create_address_mock.call_args[0][0]['postal_code'], '22203'
+        )
+        self.assertEqual(origin_address.id, 'adr_456')
+        self.assertEqual(
+            Warehouse.objects.get(pk=self.warehouse.pk).carrier_address_id,
+            'adr_456'
+        )
+
+
+    @patch('orders.views.create_address')
+    def test_origin_address_is_verified_again_when_replaced(
+        self, create_address_mock):
+        '''
+        Test that a Warehouse address is verified again when the Warehouse
+        is given another Address.
+        '''
+        create_address_mock.side_effect = [
+            Mock(id='adr_123', country='US'), Mock(id='adr_456', country='US')
+        ]
+
+        views.get_origin_address()
+        self.warehouse.address = Address.objects.create(
+            street_address='456 Test St', locality='Test', region='VA',
+            postal_code='22202', country='US'
+        )
+        self.warehouse.save()
+        origin_address = views.get_origin_address()
+
+        self.assertEqual(create_address_mock.call_count, 2)
+        self.assertEqual(
+            create_address_mock.call_args[0][0]['street_address'],
+            '456 Test St'
+        )
+        self.assertEqual(
+            create_address_mock.call_args[0][0]['phone'],
+            views.ORIGIN_ADDRESS['phone']
+        )
+        self.assertEqual(origin_address.id, 'adr_456')
+
+
+class CustomsInfoTest(TestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        shirt = Mock(sku='123-456', price=Decimal('10.00'), weight=100.0)
+        shirt.name = 'Shirt'
+        other_shirt = Mock(sku='123-789', price=Decimal('12.00'), weight=100.0)
+        other_shirt.name = 'Shirt'
+        self.products = [shirt, other_shirt, shirt, shirt]
+
+        views.cache.clear()
+
+
+    def test_customs_items_are_aggregated_by_sku(self):
+        '''
+        Test that customs items are declared per SKU, even if several SKUs
+        share a name.
+        '''
+        customs_items = views.create_customs_items(self.products)
+
+        self.assertEqual(
+            [(item['description'], item['quantity'], item['value'])
+             for item in customs_items],
+            [('Shirt', 3, '30.00'), ('Shirt', 1, '12.00')]
+        )
+
+
+    @patch('orders.views.easypost.CustomsInfo.create')
+    def test_customs_info_is_created_in_a_single_call(self, create_mock):
+        '''
+        Test that a CustomsInfo and its customs items are created with a
+        single EasyPost API call, and reused for repeat quotes.
+        '''
+        create_mock.return_value = Mock(id='cstinfo_123')
+
+        views.create_customs_info(self.products)
+        customs_info = views.create_customs_info(list(reversed(self.products)))
+
+        self.assertEqual(create_mock.call_count, 1)
+        self.assertEqual(
+            len(create_mock.call_args[1]['customs_items']), 2
+        )
+        self.assertEqual(customs_info.id, 'cstinfo_123')
@@ -0,0 +1,83 @@
+import logging
+from decimal import Decimal
+from django.db.models import F
+from django.test import TestCase
+from common.models import CacheVersion
+from ..models import TaxRate
+from ..utils import TAX_RATE_INDEX_VERSION, TaxRateIndex
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+# Create your tests here.
+class TaxRateIndexTest(TestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        # Set up test data.
+        TaxRate.objects.create(
+            city='Test', state='OK', postal_code='12345',
+            local_tax_rate=Decimal('0.01'), state_tax_rate=Decimal('0.043')
+        )
+        TaxRate.objects.create(
+            city='Other', state='OK', postal_code='12345',
+            district_tax_rate=Decimal('0.007'),
+            state_tax_rate=Decimal('0.043')
+        )
+        self.index = TaxRateIndex()
+
+
+    def test_index_provides_combined_tax_rate_of_postal_code(self):
+        '''
+        Test that the TaxRateIndex provides the highest combined tax rate of
+        the jurisdictions within a postal code, ignoring ZIP+4 information.
+        '''
+        self.assertEqual(self.index.get('12345'), Decimal('0.053'))
+        self.assertEqual(self.index.get('12345-6789'), Decimal('0.053'))
+        self.assertIsNone(self.index.get('54321'))
+
+
+    def test_index_only_queries_its_version_once_loaded(self):
+        '''
+        Test that, once loaded, the TaxRateIndex looks up rates from memory
+        and only queries its version.
+        '''
+        self.index.get('12345')
+
+        with self.assertNumQueries(1):
+            tax_rate = self.index.get('12345')
+
+        self.assertEqual(tax_rate, Decimal('0.053'))
+
+
+    def test_index_reloads_when_tax_rates_change(self):
+        '''
+        Test that the TaxRateIndex reloads after a TaxRate changes.
+        '''
+        self.index.get('12345')
+
+        TaxRate.objects.create(
+            city='Test', state='OK', postal_code='54321',
+            state_tax_rate=Decimal('0.043')
+        )
+
+        self.assertEqual(self.index.get('54321'), Decimal('0.043'))
+
+
+    def test_index_reloads_when_invalidated_by_another_process(self):
+        '''
+        Test that the TaxRateIndex reloads once its version is changed in the
+        database, as by another process.
+        '''
+        self.index.get('12345')
+
+        # Change TaxRates without sending signals, then bump the version
+        # directly, as another process would.
+        TaxRate.objects.update(local_tax_rate=Decimal('0.02'))
+        CacheVersion.objects.filter(name=TAX_RATE_INDEX_VERSION).update(
+            version=F('version') + 1
+        )
+
+        self.assertEqual(self.index.get('12345'), Decimal('0.07'))
@@ -0,0 +1,338 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+import braintree
+from collections import Counter, deque
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from measurement.measures import Weight
+from common.utils import get_cache_version, increment_cache_version
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+def get_shipping_rate_budget():
+    '''
+    Return the number of seconds to wait on any one shipping rate source, and
+    on all of them combined, defaulting to 5 and 8 seconds.
+    '''
+    return (
+        getattr(settings, 'SHIPPING_RATE_TIMEOUT', 5),
+        getattr(settings, 'SHIPPING_RATE_DEADLINE', 8)
+    )
+
+
+def get_pricing_max_age():
+    '''
+    Return the number of seconds that checkout may reuse pricing it memoized
+    within the Session, defaulting to 15 minutes.
+    '''
+    return getattr(settings, 'CHECKOUT_PRICING_MAX_AGE', 15 * 60)
+
+
+class ShippingRateCache(object):
+    '''
+    A cache of shipping rates, keyed by rate source, normalized destination,
+    weight bucket, customs profile and (for supplier-backed rates) the Variants
+    being shipped. Entries expire and are evicted per the
+    `shipping_rates` cache configuration (TIMEOUT and MAX_ENTRIES).
+    '''
+    key_prefix = 'orders.ShippingRateCache'
+
+    def __init__(self, alias='shipping_rates'):
+        self.alias = alias
+
+
+    @property
+    def cache(self):
+        # Cache connections are thread-local, so look them up on every use.
+        return caches[self.alias]
+
+
+    def normalize_destination(self, address):
+        '''
+        Reduce a shipping address to the fields that determine its rate.
+        '''
+        country = (address.get('country') or '').strip().upper()
+        region = (address.get('region') or '').strip().upper()
+        postal_code = (
+            (address.get('postal_code') or '').replace(' ', '').upper()
+        )
+
+        if country == 'US':
+            # Disregard any ZIP+4 information.
+            postal_code = postal_code.split('-')[0]
+
+        return (country, region, postal_code)
+
+
+    def get_weight_bucket(self, products):
+        '''
+        Round the combined weight of `products` up to the nearest bucket.
+        '''
+        bucket = settings.SHIPPING_RATE_CACHE_WEIGHT_BUCKET
+        weight = Weight(g=math.fsum(product.weight for product in products))
+
+        return int(math.ceil(weight.oz / bucket) * bucket)
+
+
+    def get_customs_profile(self, destination, products):
+        '''
+        Describe the contents of an international parcel, as declared to
+        customs. Domestic parcels have no customs profile.
+        '''
+        country, region, postal_code = destination
+        if country == settings.SHIPPING_ORIGIN_COUNTRY:
+            return None
+
+        quantities = Counter(product.sku for product in products)
+        prices = {product.sku: str(product.price) for product in products}
+
+        return sorted(
+            (sku, quantity, prices[sku]) for sku, quantity in quantities.items()
+        )
+
+
+    def get_key(self, source, address, products, by_product=False):
+        '''
+        Build the cache key of a shipping rate request. Rates of sources that
+        quote specific products (`by_product`), rather than parcels, are only
+        shared between requests for the same Variants.
+        '''
+        destination = self.normalize_destination(address)
+        profile = json.dumps([
+            source,
+            destination,
+            self.get_weight_bucket(products),
+            self.get_customs_profile(destination, products),
+            sorted(product.pk for product in products) if by_product else None,
+        ])
+
+        return '%s:%s' % (
+            self.key_prefix, hashlib.md5(profile.encode('utf-8')).hexdigest()
+        )
+
+
+    def get(self, key):
+        rate = self.cache.get(key)
+        self.increment('hits' if rate is not None else 'misses')
+
+        return Decimal(rate) if rate is not None else None
+
+
+    def set(self, key, rate):
+        # A zero rate means that no rate could be found; do not cache it.
+        if rate:
+            self.cache.set(key, str(rate))
+
+
+    def increment(self, counter):
+        counter_key = '%s.%s' % (self.key_prefix, counter)
+        self.cache.add(counter_key, 0, None)
+        try:
+            self.cache.incr(counter_key)
+        except ValueError:
+            # The counter was evicted in the meantime.
+            self.cache.set(counter_key, 1, None)
+
+
+    @property
+    def stats(self):
+        '''
+        Return the number of cache hits and misses.
+        '''
+        counters = self.cache.get_many([
+            '%s.%s' % (self.key_prefix, counter)
+            for counter in ('hits', 'misses')
+        ])
+
+        return {
+            counter: counters.get('%s.%s' % (self.key_prefix, counter), 0)
+            for counter in ('hits', 'misses')
+        }
+
+
+    def clear(self):
+        self.cache.clear()
+
+
+TAX_RATE_INDEX_VERSION = 'orders.TaxRateIndex'
+
+
+class TaxRateIndex(object):
+    '''
+    An in-memory index of combined sales tax rates by postal code, shared by
+    every request within the process. The index is reloaded from the database
+    whenever its CacheVersion changes.
+    '''
+    def __init__(self):
+        self.version = None
+        self.rates = {}
+
+
+    @staticmethod
+    def normalize_postal_code(postal_code):
+        # Disregard any ZIP+4 information.
+        return (postal_code or '').strip().split('-')[0]
+
+
+    @staticmethod
+    def invalidate():
+        increment_cache_version(TAX_RATE_INDEX_VERSION)
+
+
+    def get_version(self):
+        return get_cache_version(TAX_RATE_INDEX_VERSION)
+
+
+    def load(self):
+        '''
+        Map each postal code to its combined (state, district, county and
+        local) tax rate. Where jurisdictions overlap within a postal code, the
+        highest combined rate applies.
+        '''
+        from .models import TaxRate
+
+        version = self.get_version()
+
+        logger.info('Loading tax rate index...')
+
+        rates = {}
+        for postal_code, state, district, county, local in (
+            TaxRate.objects.exclude(
+                Q(postal_code__isnull=True) | Q(postal_code='')
+            ).values_list(
+                'postal_code', 'state_tax_rate', 'district_tax_rate',
+                'county_tax_rate', 'local_tax_rate'
+            )):
+            postal_code = self.normalize_postal_code(postal_code)
+            tax_rate = state + district + county + local
+            rates[postal_code] = max(tax_rate, rates.get(postal_code, tax_rate))
+
+        self.rates, self.version = rates, version
+
+        logger.info('Loaded tax rate index (%s postal codes).' % len(rates))
+
+
+    def get(self, postal_code):
+        '''
+        Return the combined tax rate of `postal_code`, or None if no TaxRate
+        exists for it.
+        '''
+        if self.version != self.get_version():
+            self.load()
+
+        return self.rates.get(self.normalize_postal_code(postal_code))
+
+
+class ClientTokenPool(object):
+    '''
+    A pool of pre-generated Braintree client tokens, so that rendering the
+    payment form does not wait on the Braintree gateway. Each token is served
+    once, tokens older than `max_age` seconds are discarded, and the pool is
+    refilled on a background thread once fewer than `low_water` tokens remain.
+    '''
+    def __init__(self, generate=None, size=None, max_age=None, low_water=None):
+        self.generate = generate
+        self.size = size
+        self.max_age = max_age
+        self.low_water = low_water
+        self.tokens = deque()
+        self.lock = threading.Lock()
+        self.refilling = False
+
+
+    def generate_token(self):
+        generate = self.generate or braintree.ClientToken.generate
+        return generate()
+
+
+    def get_size(self):
+        return self.size or settings.BRAINTREE_CLIENT_TOKEN_POOL_SIZE
+
+
+    def get_max_age(self):
+        return self.max_age or settings.BRAINTREE_CLIENT_TOKEN_MAX_AGE
+
+
+    def get_low_water(self):
+        if self.low_water is not None:
+            return self.low_water
+        return getattr(
+            settings, 'BRAINTREE_CLIENT_TOKEN_POOL_LOW_WATER',
+            self.get_size() // 2
+        )
+
+
+    def discard_expired(self):
+        expiry = time.time() - self.get_max_age()
+        while self.tokens and self.tokens[0][1] < expiry:
+            self.tokens.popleft()
+
+
+    def get(self):
+        '''
+        Serve the oldest unexpired client token, generating one on the spot
+        only if the pool is empty, and refill the pool once it runs low.
+        '''
+        with self.lock:
+            self.discard_expired()
+            token = self.tokens.popleft()[0] if self.tokens else None
+            low = len(self.tokens) < self.get_low_water()
+
+        if token is None:
+            logger.info('Client token pool is empty; generating token...')
+            token = self.generate_token()
+
+        if low:
+            self.refill_async()
+
+        return token
+
+
+    def refill(self):
+        '''
+        Generate client tokens until the pool is full.
+        '''
+        while True:
+            with self.lock:
+                self.discard_expired()
+                if len(self.tokens) >= self.get_size():
+                    break
+
+            try:
+                token = self.generate_token()
+            except Exception as e:
+                logger.error('Unable to generate client token: %s' % e)
+                break
+
+            with self.lock:
+                self.tokens.append((token, time.time()))
+
+
+    def refill_async(self):
+        '''
+        Refill the pool on a background thread, unless one is already running.
+        '''
+        with self.lock:
+            if self.refilling:
+                return None
+            self.refilling = True
+
+        def run():
+            try:
+                self.refill()
+            finally:
+                with self.lock:
+                    self.refilling = False
+
+        thread = threading.Thread(target=run, name='ClientTokenPool.refill')
+        thread.daemon = True
+        thread.start()
+
+        return thread
@@ -1,12 +1,18 @@
+import functools
+import hashlib
 import importlib
+import json
 import logging
+import math
 import random
-import braintree
-from collections import Counter
+import time
+from collections import OrderedDict
 from decimal import Decimal, ROUND_CEILING
 from django.conf import settings
-from django.contrib.gis.geoip2 import GeoIP2
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.db import transaction
+from django.utils.crypto import constant_time_compare, salted_hmac
 from django.template.response import TemplateResponse
 from django.views.generic import FormView, TemplateView
 import easypost
@@ -14,19 +20,59 @@ from ipware.ip import get_real_ip
 from measurement.measures import Weight
 from addresses.forms import AddressForm
 from addresses.models import Address
+from addresses.utils import get_country_code
 from carts.utils import SessionCart
+from common.utils import Outcome, call_concurrently
+from fulfillment.utils import ShippingRateTable
+from inventory.models import Warehouse
 from products.models import Variant
 from .forms import OrderReceiptForm, PaymentForm
-from .models import Order, Purchase, TaxRate, Transaction
+from .models import Order, Purchase, Transaction
+from .utils import (
+    ClientTokenPool, ShippingRateCache, TaxRateIndex, get_pricing_max_age,
+    get_shipping_rate_budget
+)
 
 # Set a universally unique identifier (UUID).
 UUID = '9bf75036-ec58-4188-be12-4f983cac7e55'
+PRICING_UUID = '0f4c2a3e-6d1b-4b8e-9a57-3c2e8d7f1b64'
+DIGESTS_UUID = '5a8e1f27-93c4-4d06-b1e2-7f6d0c9a3b85'
 
 easypost.api_key = settings.EASYPOST_API_KEY
 
 # Initialize logger.
 logger = logging.getLogger(__name__)
 
+# Initialize shipping rate cache.
+rate_cache = ShippingRateCache()
+
+# Initialize shipping rate table.
+rate_table = ShippingRateTable()
+
+# Initialize tax rate index.
+tax_rate_index = TaxRateIndex()
+
+# Initialize Braintree client token pool.
+client_token_pool = ClientTokenPool()
+
+# Declare the address that parcels are shipped from, if no Warehouse exists.
+ORIGIN_ADDRESS = {
+    'recipient_name': 'LibreTees',
+    'street_address': '2111 Jefferson Davis Hwy\r\nApt 405S',
+    'locality': 'Arlington',
+    'region': 'VA',
+    'postal_code': '22202',
+    'country': 'US',
+    'phone': '888-995-4273'
+}
+
+# Map origin addresses to their verified EasyPost IDs.
+origin_address_ids = {}
+
+# Reuse EasyPost CustomsInfo of identical customs declarations for a day.
+CUSTOMS_INFO_CACHE_KEY = 'orders.CustomsInfo:%s'
+CUSTOMS_INFO_CACHE_TIMEOUT = 60 * 60 * 24
+
 def create_address(address_info, verify=['delivery']):
 
     address = None
@@ -58,28 +104,120 @@ def create_address(address_info, verify=['delivery']):
 
 
 def create_customs_items(products):
-
-    products_aggregate = Counter(product.name for product in products)
+    '''
+    Aggregate `products` by SKU, in a single pass, into the customs items to
+    declare inline within an EasyPost CustomsInfo.
+    '''
+    products_aggregate = dict()
+    for product in products:
+        if product.sku in products_aggregate:
+            products_aggregate[product.sku][1] += 1
+        else:
+            products_aggregate[product.sku] = [product, 1]
 
     customs_items = list()
-    for item_name, quantity in products_aggregate.items():
-        product = next(
-            product for product in products if product.name == item_name
-        )
+    # Declare items in SKU order, so that identical carts match.
+    for sku, (product, quantity) in sorted(products_aggregate.items()):
         product_weight = Weight(g=product.weight * quantity)
 
-        customs_item = easypost.CustomsItem.create(
-            description=product.name,
-            quantity=quantity,
-            value=product.price * quantity,
-            weight=max(0.1, product_weight.oz),
-            origin_country='US'
-        )
-        customs_items.append(customs_item)
+        customs_items.append({
+            'description': product.name,
+            'quantity': quantity,
+            'value': str(product.price * quantity),
+            'weight': max(0.1, product_weight.oz),
+            'origin_country': settings.SHIPPING_ORIGIN_COUNTRY,
+        })
 
     return customs_items
 
 
+def create_customs_info(products):
+    '''
+    Create an EasyPost CustomsInfo, along with its customs items, in a single
+    API call. CustomsInfo are reused for repeat quotes of the same products.
+    '''
+    customs_items = create_customs_items(products)
+    cache_key = CUSTOMS_INFO_CACHE_KEY % hashlib.md5(
+        json.dumps(customs_items, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+
+    customs_info_id = cache.get(cache_key)
+    if customs_info_id:
+        return easypost.CustomsInfo.construct_from(
+            {'id': customs_info_id}, easypost.api_key
+        )
+
+    customs_info = easypost.CustomsInfo.create(
+        customs_certify=True,
+        customs_signer='libreshop',
+        contents_type='merchandise',
+        restriction_type='none',
+        restriction_comments='',
+        customs_items=customs_items
+    )
+    cache.set(cache_key, customs_info.id, CUSTOMS_INFO_CACHE_TIMEOUT)
+
+    return customs_info
+
+
+def get_origin_address():
+    '''
+    Get the verified EasyPost Address that parcels are shipped from: the
+    address of the first Warehouse, or ORIGIN_ADDRESS if there is none. Origin
+    addresses are verified once, after which only their EasyPost ID is reused.
+    '''
+    warehouse = (
+        Warehouse.objects.select_related('address').order_by('pk').first()
+    )
+
+    if warehouse:
+        address = warehouse.address
+        address_info = {
+            'recipient_name': address.recipient_name or settings.BUSINESS_NAME,
+            'street_address': address.street_address,
+            'locality': address.locality,
+            'region': address.region,
+            'postal_code': address.postal_code,
+            'country': str(address.country),
+            # Warehouse Addresses have no phone number, which carriers require
+            # for some shipments, so use that of the business.
+            'phone': ORIGIN_ADDRESS['phone'],
+        }
+        # Reuse the EasyPost ID only if the address has not been edited since
+        # it was verified.
+        fingerprint = hashlib.sha256(
+            json.dumps(address_info, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        address_id = (
+            warehouse.carrier_address_id if
+            warehouse.carrier_address_fingerprint == fingerprint else None
+        )
+    else:
+        address_id = origin_address_ids.get('default')
+        address_info = ORIGIN_ADDRESS
+
+    if address_id:
+        return easypost.Address.construct_from(
+            {'id': address_id, 'country': address_info['country']},
+            easypost.api_key
+        )
+
+    logger.info('Verifying origin address...')
+    origin_address = create_address(address_info)
+
+    if origin_address is not None:
+        if warehouse:
+            Warehouse.objects.filter(pk=warehouse.pk).update(
+                carrier_address_id=origin_address.id,
+                carrier_address_fingerprint=fingerprint
+            )
+        else:
+            origin_address_ids['default'] = origin_address.id
+        logger.info('Verified origin address (%s).' % origin_address.id)
+
+    return origin_address
+
+
 def get_shipping_rate(address, products):
 
     shipping_weight = Weight(g=sum([
@@ -87,27 +225,11 @@ def get_shipping_rate(address, products):
     )
 
     to_address = create_address(address)
-    from_address = create_address({
-        'recipient_name': 'LibreTees',
-        'street_address': '2111 Jefferson Davis Hwy\r\nApt 405S',
-        'locality': 'Arlington',
-        'region': 'VA',
-        'postal_code': '22202',
-        'country': 'US',
-        'phone': '888-995-4273'
-    })
+    from_address = get_origin_address()
 
     customs_info = None
     if to_address.country != from_address.country:
-        customs_items = create_customs_items(products)
-        customs_info = easypost.CustomsInfo.create(
-            customs_certify=True,
-            customs_signer='libreshop',
-            contents_type='merchandise',
-            restriction_type='none',
-            restriction_comments='',
-            customs_items=customs_items
-        )
+        customs_info = create_customs_info(products)
 
     parcel = easypost.Parcel.create(
         predefined_package='Parcel',
@@ -126,39 +248,148 @@ def get_shipping_rate(address, products):
     return float(rate_info.rate)
 
 
-def calculate_shipping_cost(*args, **kwargs):
+def call_shipping_backend(api_name, *args, **kwargs):
 
+    module = importlib.import_module(api_name)
+
+    return module.get_shipping_rate(*args, **kwargs)
+
+
+def get_shipping_rates(*args, **kwargs):
+    '''
+    Query every shipping rate source concurrently: the fulfillment backend of
+    each supplier for the products it drop ships, and EasyPost for products
+    that are manufactured in-house. Return an OrderedDict mapping each source
+    to an Outcome, within the SHIPPING_RATE_TIMEOUT/SHIPPING_RATE_DEADLINE
+    latency budget.
+
+    Rates are served from the shipping rate cache when a source has already
+    quoted a similar parcel to the same destination. Per SHIPPING_RATE_TABLE,
+    in-house shipments may be quoted from the local table of carrier rates.
+    '''
     products = kwargs.pop('products', [])
+    product_suppliers = [(product, product.suppliers) for product in products]
 
-    results = []
+    sources = []
     for api_name, supplier in settings.FULFILLMENT_BACKENDS:
-        kwargs.update({
-            'products': [
-                product for product in products if supplier in product.suppliers
-            ]
-        })
-        try:
-            module = importlib.import_module(api_name)
-            logger.debug('Calling \'%s.get_shipping_rate\'...' % api_name)
-            result = module.get_shipping_rate(*args, **kwargs)
-            logger.debug('Called \'%sget_shipping_rate\'.' % api_name)
-        except ImportError as e:
-            logger.critical('Unable to import module \'%s\'.' % api_name)
-        except KeyError as e:
-            logger.critical(
-                'KeyError within \'%s.%s\' backend: %s' %
-                (module_name, attribute_name, e))
-        else:
-            results.append(result)
+        supplier_products = [
+            product for product, suppliers in product_suppliers
+            if supplier in suppliers
+        ]
+        if not supplier_products:
+            continue
+
+        sources.append((api_name, supplier_products, functools.partial(
+            call_shipping_backend, api_name, *args,
+            products=supplier_products, **kwargs
+        )))
 
     manufactured_products = [
-        product for product in products if not product.suppliers
+        product for product, suppliers in product_suppliers if not suppliers
     ]
 
+    address = kwargs.get('address')
     if manufactured_products:
-        address = kwargs.pop('address')
-        rate = get_shipping_rate(address, manufactured_products)
-        results.append(rate)
+        sources.append(('easypost', manufactured_products, functools.partial(
+            get_shipping_rate, address, manufactured_products
+        )))
+
+    # Quote in-house shipments from the local shipping rate table, either
+    # instead of EasyPost ('primary') or when EasyPost fails ('fallback').
+    def quote_from_table():
+        started = time.time()
+        rate = rate_table.quote(address, math.fsum(
+            product.weight for product in manufactured_products
+        ))
+        return (
+            Outcome(rate, None, time.time() - started, False)
+            if rate is not None else None
+        )
+
+    # Consult the shipping rate cache before calling any rate source.
+    calls = []
+    cache_keys = {}
+    resolved_outcomes = {}
+    if manufactured_products and settings.SHIPPING_RATE_TABLE == 'primary':
+        table_outcome = quote_from_table()
+        if table_outcome:
+            logger.debug('Using (easypost) shipping rate from rate table.')
+            resolved_outcomes['easypost'] = table_outcome
+
+    for source, source_products, function in sources:
+        if source in resolved_outcomes:
+            continue
+
+        # Suppliers quote specific products, rather than parcels.
+        cache_key = rate_cache.get_key(
+            source, address, source_products, by_product=(source != 'easypost')
+        )
+        rate = rate_cache.get(cache_key)
+        if rate is not None:
+            logger.debug('Using cached (%s) shipping rate.' % source)
+            resolved_outcomes[source] = Outcome(rate, None, 0.0, False)
+        else:
+            logger.debug('Requesting (%s) shipping rate...' % source)
+            cache_keys[source] = cache_key
+            calls.append((source, function))
+
+    if sources:
+        logger.info(
+            'Shipping rate cache: %(hits)s hit(s), %(misses)s miss(es).' %
+            rate_cache.stats
+        )
+
+    timeout, deadline = get_shipping_rate_budget()
+    fetched_outcomes = call_concurrently(
+        calls, timeout=timeout, deadline=deadline
+    )
+
+    outcomes = OrderedDict()
+    for source, source_products, function in sources:
+        if source in resolved_outcomes:
+            outcomes[source] = resolved_outcomes[source]
+            continue
+
+        outcome = outcomes[source] = fetched_outcomes[source]
+        if not (outcome.timed_out or outcome.error):
+            rate_cache.set(cache_keys[source], outcome.result)
+        elif source == 'easypost' and settings.SHIPPING_RATE_TABLE:
+            table_outcome = quote_from_table()
+            if table_outcome:
+                logger.warning(
+                    'Falling back to rate table for (%s) shipping rate.' %
+                    source)
+                outcomes[source] = table_outcome
+
+    for source, outcome in outcomes.items():
+        if outcome.timed_out:
+            logger.warning(
+                'Timed out after %.3fs waiting on (%s) shipping rate.' %
+                (outcome.elapsed, source))
+        elif outcome.error:
+            logger.critical(
+                '%s within (%s) shipping rate source: %s' %
+                (type(outcome.error).__name__, source, outcome.error))
+        elif source in cache_keys:
+            logger.info(
+                'Received (%s) shipping rate in %.3fs.' %
+                (source, outcome.elapsed))
+
+    return outcomes
+
+
+def calculate_shipping_cost(*args, **kwargs):
+    '''
+    Sum the shipping rates of every source that answered in time. Sources that
+    fail or run out of time are left out (and logged by `get_shipping_rates`);
+    zero is returned only if no source answered at all.
+    '''
+    outcomes = get_shipping_rates(*args, **kwargs)
+
+    results = [
+        outcome.result for outcome in outcomes.values()
+        if not (outcome.timed_out or outcome.error)
+    ]
 
     return (
         Decimal(sum(results)).quantize(Decimal('1.00'), rounding=ROUND_CEILING)
@@ -217,7 +448,6 @@ class CheckoutFormView(FormView):
     def __init__(self, *args, **kwargs):
         super(CheckoutFormView, self).__init__(*args, **kwargs)
 
-        self.client_token = braintree.ClientToken.generate()
         self.deleted_data = None
 
 
@@ -266,13 +496,23 @@ class CheckoutFormView(FormView):
         self.sales_tax = Decimal(0.00)
         self.total = Decimal(0.00)
 
+        fingerprint = pricing = None
         if self.shipping_address:
 
-            # Calculate the shipping cost.
-            self.shipping_cost = calculate_shipping_cost(
-                address=self.shipping_address,
-                products=self.cart
-            )
+            # Reuse the pricing calculated earlier in checkout, unless the
+            # cart, its prices or the shipping address have changed since, or
+            # it has grown too old to trust.
+            fingerprint = self.get_pricing_fingerprint()
+            pricing = self.request.session.get(PRICING_UUID)
+            expiry = time.time() - get_pricing_max_age()
+
+            if (pricing and pricing.get('fingerprint') == fingerprint and
+                pricing.get('calculated_at', 0) >= expiry):
+                self.shipping_cost = Decimal(pricing['shipping_cost'])
+                self.sales_tax = Decimal(pricing['sales_tax'])
+            else:
+                pricing = None
+                self.calculate_pricing()
 
             # Reset 'shipping' step, if no shipping cost could be calculated.
             if not self.shipping_cost:
@@ -280,26 +520,19 @@ class CheckoutFormView(FormView):
                 del self.request.session[UUID]['shipping']
                 self.request.session.modified = True
 
-            # Otherwise, calculate sales tax, if the user is based in the US.
-            elif self.shipping_address['country'] == 'US':
-                # Disregard any ZIP+4 information.
-                zip_code = self.shipping_address['postal_code'].split('-')[0]
-
-                tax_rates = {
-                    tax_rate.postal_code:tax_rate.tax_rate
-                    for tax_rate in TaxRate.objects.all()
-                }
-                if zip_code in tax_rates:
-                    sales_tax_rate = Decimal(0.06)
-                    sales_tax = self.subtotal * sales_tax_rate
-                    self.sales_tax = Decimal(sales_tax).quantize(
-                        Decimal('1.00'), rounding=ROUND_CEILING
-                    )
-
         self.total = (
             self.subtotal + self.shipping_cost + self.sales_tax
         )
 
+        # Memoize freshly calculated pricing for the rest of checkout.
+        if self.shipping_cost and not pricing:
+            self.request.session[PRICING_UUID] = {
+                'fingerprint': fingerprint,
+                'calculated_at': time.time(),
+                'shipping_cost': str(self.shipping_cost),
+                'sales_tax': str(self.sales_tax),
+            }
+
         self.steps = (
             {
                 'name': 'shipping',
@@ -318,7 +551,6 @@ class CheckoutFormView(FormView):
                 },
                 'context': {
                     'description': 'how are you paying?',
-                    'client_token': self.client_token,
                     'shipping_cost': self.shipping_cost,
                     'sales_tax': self.sales_tax,
                     'total': self.total
@@ -331,6 +563,47 @@ class CheckoutFormView(FormView):
         return super(CheckoutFormView, self).dispatch(request, *args, **kwargs)
 
 
+    def get_pricing_fingerprint(self):
+        '''
+        Digest everything that checkout pricing depends upon: the Variants in
+        the cart, their prices, the shipping address, and the versions of the
+        tax rates and shipping rate table.
+        '''
+        fingerprint = json.dumps([
+            sorted(
+                (variant.pk, variant.quantity, str(variant.price))
+                for variant in self.cart
+            ),
+            self.shipping_address,
+            tax_rate_index.get_version(),
+            rate_table.get_version(),
+        ], sort_keys=True, default=str)
+
+        return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+
+
+    def calculate_pricing(self):
+        '''
+        Calculate the shipping cost and sales tax of the cart.
+        '''
+        # Calculate the shipping cost.
+        self.shipping_cost = calculate_shipping_cost(
+            address=self.shipping_address,
+            products=self.cart.units
+        )
+
+        # Calculate sales tax, if the user is based in the US.
+        if self.shipping_cost and self.shipping_address['country'] == 'US':
+            sales_tax_rate = tax_rate_index.get(
+                self.shipping_address['postal_code']
+            )
+            if sales_tax_rate is not None:
+                sales_tax = self.subtotal * sales_tax_rate
+                self.sales_tax = Decimal(sales_tax).quantize(
+                    Decimal('1.00'), rounding=ROUND_CEILING
+                )
+
+
     def get_current_step(self):
         '''
         Get the current step within the form wizard.
@@ -383,9 +656,9 @@ class CheckoutFormView(FormView):
             # Populate the form's `country` field with the user's apparent
             # location.
             if ip_address and not form.is_bound:
-                geo_ip2 = GeoIP2()
-                location = geo_ip2.country(ip_address)
-                form.fields['country'].initial = location['country_code']
+                country_code = get_country_code(ip_address)
+                if country_code:
+                    form.fields['country'].initial = country_code
 
         logger.debug(
             'Got %s %s form' % (
@@ -401,10 +674,28 @@ class CheckoutFormView(FormView):
         self.request.session[UUID].update({
             self.current_step['name']: form.cleaned_data,
         })
+        self.request.session.setdefault(DIGESTS_UUID, {}).update({
+            self.current_step['name']: self.get_step_digest(
+                self.current_step['name'], form.cleaned_data
+            ),
+        })
         self.request.session.modified = True
 
         # Create an order if there are no more steps to complete.
         if not self.get_current_step():
+            order = self.create_order(form.cleaned_data)
+            self.order_token = order.token
+
+        return super(CheckoutFormView, self).form_valid(form)
+
+
+    def create_order(self, payment_data):
+        '''
+        Persist the Order, its Purchases and its Transaction within a single
+        database transaction, inserting a Purchase for every unit of every
+        line of the cart in one statement.
+        '''
+        with transaction.atomic():
             shipping_address = Address.objects.create(**self.shipping_address)
             order = Order.objects.create(
                 shipping_address=shipping_address,
@@ -414,37 +705,46 @@ class CheckoutFormView(FormView):
                 total=self.total
             )
 
-            self.order_token = order.token
-
-            for variant in self.cart:
-                purchase = Purchase.objects.create(
-                    order=order,
-                    variant=variant,
-                    price=variant.price
-                )
+            Purchase.objects.bulk_create([
+                Purchase(order=order, variant=variant, price=variant.price)
+                for variant in self.cart
+                for i in range(variant.quantity)
+            ])
 
             Transaction.objects.create(
                 order=order,
-                transaction_id=form.cleaned_data.get('transaction_id'),
-                amount=form.cleaned_data.get('amount'),
-                cardholder_name=form.cleaned_data.get('cardholder_name'),
-                country=form.cleaned_data.get('country'),
-                payment_card_type=form.cleaned_data.get('payment_card_type'),
-                payment_card_last_4=form.cleaned_data.get('payment_card_last_4'),
-                payment_card_expiration_date=form.cleaned_data.get(
+                transaction_id=payment_data.get('transaction_id'),
+                amount=payment_data.get('amount'),
+                cardholder_name=payment_data.get('cardholder_name'),
+                country=payment_data.get('country'),
+                payment_card_type=payment_data.get('payment_card_type'),
+                payment_card_last_4=payment_data.get('payment_card_last_4'),
+                payment_card_expiration_date=payment_data.get(
                     'payment_card_expiration_date'
                 ),
-                created_at = form.cleaned_data.get('created_at'),
+                created_at = payment_data.get('created_at'),
                 origin_ip_address = get_real_ip(self.request),
-                authorized = form.cleaned_data.get('authorized')
+                authorized = payment_data.get('authorized')
             )
 
-        return super(CheckoutFormView, self).form_valid(form)
+        return order
+
+
+    def get_step_digest(self, step_name, step_data):
+        '''
+        Sign the validated data of a checkout step, so that it can be trusted
+        on later requests for as long as it remains unchanged.
+        '''
+        key_salt = 'orders.views.CheckoutFormView.%s' % step_name
+        value = json.dumps(step_data, sort_keys=True, default=str)
+
+        return salted_hmac(key_salt, value).hexdigest()
 
 
     def session_data_is_valid(self):
 
         session_data = self.request.session.get(UUID, None)
+        digests = self.request.session.get(DIGESTS_UUID, {})
 
         is_valid = True
         if session_data:
@@ -456,6 +756,13 @@ class CheckoutFormView(FormView):
                 step_name = completed_step['name']
                 form_class = completed_step['form_class']
 
+                # Trust step data that is unchanged since it was validated.
+                digest = self.get_step_digest(
+                    step_name, session_data[step_name]
+                )
+                if constant_time_compare(digests.get(step_name, ''), digest):
+                    continue
+
                 form = form_class(data=session_data[step_name])
                 if not form.is_valid():
                     is_valid = False
@@ -513,6 +820,8 @@ class CheckoutFormView(FormView):
 
             # Delete all CheckoutFormView Session Data.
             del self.request.session[UUID]
+            self.request.session.pop(PRICING_UUID, None)
+            self.request.session.pop(DIGESTS_UUID, None)
 
             # Add the Order Token to CheckoutFormView Session Data.
             self.request.session[UUID] = {
@@ -545,4 +854,8 @@ class CheckoutFormView(FormView):
         if step_context:
             context.update(step_context)
 
+        # Only the payment form needs a Braintree client token.
+        if self.current_step['name'] == 'payment':
+            context['client_token'] = client_token_pool.get()
+
         return context
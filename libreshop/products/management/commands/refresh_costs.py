@@ -0,0 +1,154 @@
+import logging
+import signal
+import time
+import sys
+import schedule
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from daemon import DaemonContext
+from products.models import Variant
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = 'Recomputes Variant costs that are about to expire, in batches.'
+
+    def add_arguments(self, parser):
+        '''
+        Set up command line arguments for the management command.
+        '''
+        parser.add_argument(
+            '-a', '--ahead', type=int, dest='ahead', default=60,
+            help='Refresh costs expiring within this many minutes.'
+        )
+        parser.add_argument(
+            '-b', '--batch-size', type=int, dest='batch_size', default=100,
+            help='Number of Variants to load per query.'
+        )
+        parser.add_argument(
+            '-i', '--interval', type=int, dest='interval', default=15,
+            help='Minutes between refreshes when running as a server.'
+        )
+        parser.add_argument(
+            '-d', '--daemon', action='store_true', dest='daemon'
+        )
+        parser.add_argument(
+            '-s', '--server', action='store_true', dest='server'
+        )
+
+
+    def refresh_costs(self, ahead, batch_size):
+        '''
+        Recompute the cost of every Variant whose cost has never been cached
+        or expires within `ahead` minutes, soonest first, loading `batch_size`
+        Variants at a time.
+        '''
+        logger.info('Refreshing Variant costs...')
+
+        deadline = timezone.now() + timedelta(minutes=ahead)
+        variant_pks = list(
+            Variant._base_manager.
+            filter(
+                Q(_cost_cache_expiration__isnull=True) |
+                Q(_cost_cache_expiration__lt=deadline)
+            ).
+            order_by('_cost_cache_expiration').
+            values_list('pk', flat=True)
+        )
+
+        refreshed = failed = 0
+        for start in range(0, len(variant_pks), batch_size):
+            batch = (
+                Variant._base_manager.
+                filter(pk__in=variant_pks[start:start + batch_size]).
+                prefetch_related(
+                    'fulfillmentsettingvalue_set__setting__supplier',
+                    'components__inventory'
+                )
+            )
+
+            for variant in batch:
+                try:
+                    variant.refresh_cost()
+                except Exception as e:
+                    # Keep the stale cost and retry on the next run.
+                    failed += 1
+                    logger.error(
+                        'Unable to refresh cost of (%s): %s' % (variant, e)
+                    )
+                else:
+                    refreshed += 1
+
+        logger.info(
+            'Refreshed (%s) Variant costs, (%s) failed.' % (refreshed, failed)
+        )
+
+        return refreshed, failed
+
+
+    def server_callback(self, *args, **options):
+        logger.info('Cost refresh server starting...')
+
+        while True:
+            schedule.run_pending()
+
+            # Break out of the server loop, if in test mode.
+            test_mode = options.pop('test', False)
+            if test_mode:
+                break;
+
+            # Sleep for one second.
+            time.sleep(1)
+
+
+    def exit_callback(self, *args, **options):
+        logger.info('Cost refresh server exiting...')
+        sys.exit(0)
+
+
+    def handle(self, *args, **options):
+        '''
+        Handle management command processing.
+        '''
+        logger.info('Processing \'refresh_costs\' management command...')
+
+        # Get command line arguments from 'options' dict.
+        ahead = options['ahead']
+        batch_size = options['batch_size']
+        interval = options['interval']
+        daemon = options['daemon']
+        server = options['server'] or daemon
+
+        refreshed, failed = self.refresh_costs(ahead, batch_size)
+
+        message = 'Refreshed %s Variant cost(s).' % refreshed
+        self.stdout.write(self.style.SUCCESS(message))
+        if failed:
+            message = 'Unable to refresh %s Variant cost(s).' % failed
+            self.stdout.write(self.style.WARNING(message))
+
+        # Enter the server loop if the '--server' option was specified.
+        if server:
+            # Set up SIGINT signal to call on ctrl-c.
+            signal.signal(  # pragma: no cover
+                signal.SIGINT, lambda sig, frame: self.exit_callback()
+            )
+
+            schedule.every(interval).minutes.do(
+                self.refresh_costs, ahead, batch_size
+            )
+
+            # Begin server loop.
+            if daemon:
+                logger.info('Daemonizing server process...')
+                with DaemonContext():
+                    self.server_callback(*args, **options)
+            else:
+                self.server_callback(*args, **options)
+
+        logger.info('Processed \'refresh_costs\' management command.')
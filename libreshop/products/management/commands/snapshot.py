@@ -0,0 +1,60 @@
+import logging
+from django.core.management.base import BaseCommand
+from products.models import Category, Snapshot
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = 'Reports the staleness of, and rebuilds, storefront snapshots.'
+
+    def add_arguments(self, parser):
+        '''
+        Set up command line arguments for the management command.
+        '''
+        parser.add_argument(
+            '-c', '--check', action='store_true', dest='check',
+            help='Report stale snapshots without rebuilding them.'
+        )
+
+
+    def handle(self, *args, **options):
+        '''
+        Handle management command processing.
+        '''
+        logger.info('Processing \'snapshot\' management command...')
+
+        check = options['check']
+
+        snapshots = {
+            snapshot.category_id: snapshot
+            for snapshot in Snapshot.objects.select_related('category')
+        }
+
+        for category in [None] + list(Category.objects.all()):
+            snapshot = snapshots.get(getattr(category, 'pk', None))
+            name = category or 'home page'
+
+            if not snapshot:
+                message = 'Snapshot of %s has not been built.' % name
+                self.stdout.write(self.style.WARNING(message))
+            elif snapshot.stale:
+                message = 'Snapshot of %s is stale (built %s).' % (
+                    name, snapshot.modified.strftime('%Y-%m-%d %H:%M:%S')
+                )
+                self.stdout.write(self.style.WARNING(message))
+            else:
+                message = 'Snapshot of %s is current (built %s).' % (
+                    name, snapshot.modified.strftime('%Y-%m-%d %H:%M:%S')
+                )
+                self.stdout.write(message)
+
+            if not check:
+                Snapshot.objects.build(category=category)
+                self.stdout.write(self.style.SUCCESS(
+                    'Rebuilt snapshot of %s.' % name
+                ))
+
+        logger.info('Processed \'snapshot\' management command.')
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2017-01-21 16:40
+from __future__ import unicode_literals
+
+from collections import defaultdict
+from django.db import migrations, models
+
+
+def populate_sku(apps, schema_editor):
+    Variant = apps.get_model('products', 'Variant')
+    variants = Variant.objects.select_related('product').exclude(
+        sub_sku__isnull=True).exclude(sub_sku='')
+
+    skus = defaultdict(list)
+    for variant in variants:
+        variant._sku = (variant.product.sku + variant.sub_sku).strip().upper()
+        skus[variant._sku].append(variant)
+
+    # Full SKUs differing only in character case, or concatenating to the same
+    # value (e.g. 'AB' + 'CD' and 'ABC' + 'D'), cannot be made unique.
+    collisions = [
+        '%s (%s)' % (sku, ', '.join(
+            '%s + %s' % (variant.product.sku, variant.sub_sku)
+            for variant in colliding_variants
+        ))
+        for sku, colliding_variants in sorted(skus.items())
+        if len(colliding_variants) > 1
+    ]
+    if collisions:
+        raise ValueError(
+            'Variant SKUs are not unique at the catalog level; change the '
+            'Product SKU or Variant Sub-SKU of each of the following before '
+            'migrating: %s' % '; '.join(collisions)
+        )
+
+    for (variant,) in skus.values():
+        variant.save(update_fields=['_sku'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0024_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variant',
+            name='_sku',
+            field=models.CharField(blank=True, editable=False, max_length=16, null=True),
+        ),
+        migrations.RunPython(populate_sku, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='variant',
+            name='_sku',
+            field=models.CharField(blank=True, editable=False, max_length=16, null=True, unique=True),
+        ),
+    ]
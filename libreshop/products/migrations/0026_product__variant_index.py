@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2017-01-23 02:15
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0025_variant__sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='_variant_index',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2017-01-24 21:03
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def reset_variant_index(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Product.objects.update(_variant_index=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0026_product__variant_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_variant_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2017-01-26 18:42
+from __future__ import unicode_literals
+
+from datetime import datetime
+from django.db import migrations, models
+from django.utils.timezone import utc
+
+
+def reset_uncalculated_costs(apps, schema_editor):
+    Variant = apps.get_model('products', 'Variant')
+
+    # Costs expiring at the epoch have never been calculated.
+    Variant.objects.filter(
+        _cost_cache_expiration__lte=datetime(1970, 1, 1, tzinfo=utc)
+    ).update(_cost_cache_expiration=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0027_reset_variant_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='variant',
+            name='_cost_cache_expiration',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            reset_uncalculated_costs, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2017-01-27 17:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def set_snapshot_keys(apps, schema_editor):
+    Snapshot = apps.get_model('products', 'Snapshot')
+
+    # Concurrent builds may have created more than one home page snapshot, of
+    # which only the most recent one is kept.
+    home_snapshots = Snapshot.objects.filter(category=None).order_by('-modified')
+    for snapshot in home_snapshots[1:]:
+        snapshot.delete()
+
+    for snapshot in Snapshot.objects.all():
+        snapshot.key = (
+            'category:%s' % snapshot.category_id if snapshot.category_id else
+            'home'
+        )
+        snapshot.save(update_fields=['key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0028_variant_cost_cache_expiration_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snapshot',
+            name='key',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(set_snapshot_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='snapshot',
+            name='key',
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+    ]
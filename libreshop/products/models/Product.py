@@ -1,18 +1,110 @@
+import json
 import logging
+import re
+from collections import OrderedDict
 from django.core.exceptions import ValidationError
 from django.db import models, transaction
+from django.db.models import F, Func, Prefetch, Value
+from django.db.models.functions import Concat, Upper
+from django.db.models.signals import post_delete, post_save
 from django.template.defaultfilters import slugify
+from django.utils.functional import cached_property
 from model_utils.models import TimeStampedModel
 from versatileimagefield.fields import PPOIField, VersatileImageField
 from .Image import Image
-from .Variant import Variant
+from .Variant import Attribute, AttributeValue, Variant, normalize_sku
 
 # Initialize logger.
 logger = logging.getLogger(__name__)
 
+def get_available_slug(name, exclude=None, allocated=None):
+    '''
+    Return an unused slug for a Product name, appending the next free numeric
+    suffix if necessary.
+
+    All existing candidates (`slug`, `slug2`, `slug3`, ...) are fetched with a
+    single query. Slugs allocated to Products that have not been saved yet
+    (e.g. during a bulk import) can be reserved by passing the same
+    `allocated` set to each call.
+    '''
+    slug = slugify(name)
+    allocated = allocated if allocated is not None else set()
+
+    queryset = Product.objects.filter(slug__startswith=slug)
+    if exclude:
+        queryset = queryset.exclude(pk=exclude)
+
+    suffix = re.compile(r'^%s(\d*)$' % re.escape(slug))
+    used_slugs = {
+        used_slug for used_slug
+        in list(queryset.values_list('slug', flat=True)) + list(allocated)
+        if suffix.match(used_slug)
+    }
+
+    available_slug, iterations = (slug, 1)
+    while available_slug in used_slugs:
+        iterations += 1
+        available_slug = slug + str(iterations)
+
+    allocated.add(available_slug)
+
+    return available_slug
+
+
+def get_combination_key(attributes):
+    '''
+    Return a canonical key for a combination of attribute values, given a dict
+    of attribute names to values (or to single-value sets, as provided by
+    ProductOrderForm).
+    '''
+    combination = sorted(
+        (name, next(iter(value)) if isinstance(value, (set, frozenset)) else
+            value)
+        for name, value in attributes.items()
+    )
+    # Match the output of `JSON.stringify` so that browsers can compute keys.
+    return json.dumps(combination, separators=(',', ':'), ensure_ascii=False)
+
+
 # Create your models here.
+class ProductQuerySet(models.QuerySet):
+
+    def for_storefront(self):
+        '''
+        Return salable Products along with their salable Variants (ordered by
+        price) and featured Images, using a constant number of queries.
+        '''
+        salable_variants = Variant.objects.filter(
+            enabled=True, sub_sku__gt=''
+        ).order_by('price', 'created')
+        featured_images = Image.objects.filter(
+            featured=True
+        ).order_by('-modified')
+
+        return self.filter(
+            variant__enabled=True, variant__sub_sku__gt=''
+        ).distinct().prefetch_related(
+            Prefetch(
+                'variant_set', queryset=salable_variants,
+                to_attr='salable_variants'
+            ),
+            Prefetch(
+                'image_set', queryset=featured_images,
+                to_attr='featured_images'
+            ),
+        )
+
+
 class ProductManager(models.Manager):
 
+    def get_queryset(self):
+        return ProductQuerySet(self.model, using=self._db)
+
+
+    def for_storefront(self):
+        return self.get_queryset().for_storefront()
+
+
     def create(self, *args, **kwargs):
         product = None
         with transaction.atomic():
@@ -36,6 +128,7 @@ class Product(TimeStampedModel):
     name = models.CharField(max_length=64, unique=True, null=False, blank=False)
     description = models.CharField(max_length=2048, null=True, blank=True)
     slug = models.SlugField(unique=True, null=True, blank=True)
+    _variant_index = models.TextField(null=True, blank=True, editable=False)
 
     fulfillment_settings = models.ManyToManyField(
         'fulfillment.FulfillmentSetting',
@@ -52,30 +145,123 @@ class Product(TimeStampedModel):
         super(Product, self).__init__(*args, **kwargs)
         self._meta.get_field('sku').verbose_name = 'SKU'
         self._meta.get_field('sku').verbose_name_plural = 'SKUs'
+        self._original_name = self.name
+        self._original_sku = self.sku
+
+
+    @cached_property
+    def attribute_matrix(self):
+        '''
+        Return the attribute values of each Variant (variants x attributes) as
+        an ordered dict of Variant PKs to ordered dicts of attribute names to
+        values, built with a single query.
+        '''
+        attribute_values = AttributeValue.objects.filter(
+            variant__product=self
+        ).order_by(
+            'variant__created', 'variant', '-created'
+        ).values_list('variant', 'attribute__name', 'value')
+
+        matrix = OrderedDict()
+        for variant_pk, name, value in attribute_values:
+            matrix.setdefault(variant_pk, OrderedDict())[name] = value
+
+        return matrix
 
 
     @property
     def attributes(self):
 
-        attributes = {}
-        variants = self.variant_set.all().order_by('created')
-
-        for variant in variants:
-            for key in variant.attributes:
-                variant_attributes = variant.attributes[key]
-                if key not in attributes:
-                    attributes[key] = list(variant_attributes)
-                else:
-                    for attribute in variant_attributes:
-                        if attribute not in attributes[key]:
-                            attributes[key].append(attribute)
+        attributes = OrderedDict()
+        for variant_attributes in self.attribute_matrix.values():
+            for key, value in variant_attributes.items():
+                values = attributes.setdefault(key, [])
+                if value not in values:
+                    values.append(value)
 
         return attributes
 
 
+    @property
+    def variant_index(self):
+        '''
+        Return a dict of attribute combination keys to the PK, SKU, price and
+        salability of each Variant, as persisted when the Product, its
+        Variants or their attributes were last saved.
+        '''
+        if self._variant_index is None:
+            return self.build_variant_index()
+
+        return json.loads(self._variant_index)
+
+
+    def refresh_variant_index(self):
+        '''
+        Rebuild the Variant index from the current attribute matrix and persist
+        it, without keeping the matrix cached on this instance.
+        '''
+        self.__dict__.pop('attribute_matrix', None)
+        self._variant_index = json.dumps(self.build_variant_index())
+        self.__dict__.pop('attribute_matrix', None)
+        Product.objects.filter(pk=self.pk).update(
+            _variant_index=self._variant_index
+        )
+
+
+    def build_variant_index(self):
+        '''
+        Map the combination of distinguishing attribute values (those offered
+        as choices by ProductOrderForm) of each Variant to the Variant.
+        '''
+        choices = {
+            key for key, values in self.attributes.items() if len(values) > 1
+        }
+
+        index = {}
+        for variant in self.variant_set.order_by('created'):
+            attributes = {
+                key: value
+                for key, value in self.attribute_matrix.get(
+                    variant.pk, {}).items()
+                if key in choices
+            }
+            index.setdefault(get_combination_key(attributes), {
+                'id': variant.pk,
+                'sku': variant.sku,
+                'price': str(variant.price),
+                'salable': variant.salable,
+            })
+
+        return index
+
+
+    @property
+    def variant_map(self):
+        '''
+        Return the Variant index without primary keys, so that browsers can
+        resolve a combination of attribute values to a Variant.
+        '''
+        return {
+            key: {name: value for name, value in entry.items() if name != 'id'}
+            for key, entry in self.variant_index.items()
+        }
+
+
+    def get_variant(self, attributes):
+        '''
+        Return the Variant matching a combination of attribute values, or None.
+        '''
+        entry = self.variant_index.get(get_combination_key(attributes))
+        return Variant.objects.filter(pk=entry['id']).first() if entry else None
+
+
     @property
     def featured_image(self):
-        image = Image.objects.filter(product=self, featured=True).latest()
+        if hasattr(self, 'featured_images'):
+            # Use Images prefetched by `ProductQuerySet.for_storefront`.
+            image = next(iter(self.featured_images), None)
+        else:
+            image = Image.objects.filter(product=self, featured=True).latest()
         return image.file if image else None
 
 
@@ -103,12 +289,21 @@ class Product(TimeStampedModel):
 
     @property
     def maximum_margin(self):
-        return max([variant.margin for variant in self.variants])
+        margins = self.known_margins
+        return max(margins) if margins else None
 
 
     @property
     def minimum_margin(self):
-        return min([variant.margin for variant in self.variants])
+        margins = self.known_margins
+        return min(margins) if margins else None
+
+
+    @property
+    def known_margins(self):
+        # Variants whose cost has not been calculated yet have no margin.
+        margins = [variant.margin for variant in self.variants]
+        return [margin for margin in margins if margin is not None]
 
 
     @property
@@ -118,6 +313,10 @@ class Product(TimeStampedModel):
 
     @property
     def variants(self):
+        if hasattr(self, 'salable_variants'):
+            # Use Variants prefetched by `ProductQuerySet.for_storefront`.
+            return self.salable_variants
+
         salable_variants = [
             variant for variant in self.variant_set.all() if variant.salable
         ]
@@ -142,6 +341,19 @@ class Product(TimeStampedModel):
         validation_errors = {}
         if sku_queryset.exists():
             validation_errors['sku'] = ['Product with this SKU already exists',]
+        elif self.pk and self.sku != self._original_sku:
+            # Check that the new full SKUs of existing Variants are unique at
+            # the catalog level.
+            skus = [
+                normalize_sku(self.sku + sub_sku) for sub_sku in
+                Variant.objects.filter(product=self, sub_sku__gt='').
+                values_list('sub_sku', flat=True)
+            ]
+            sku_queryset = Variant.objects.filter(_sku__in=skus).exclude(
+                product=self
+            )
+            if skus and sku_queryset.exists():
+                validation_errors['sku'] = ['Product SKU and Variant Sub-SKU are not unique at the catalog level',]
         if name_queryset.exists():
             validation_errors['name'] = ['Product with this Name already exists',]
 
@@ -151,24 +363,12 @@ class Product(TimeStampedModel):
 
     def save(self, *args, **kwargs):
 
-        # Fetch original data from the database.
-        if self.pk:
-            original_product = Product.objects.get(pk=self.pk)
+        # Discard the cached attribute matrix.
+        self.__dict__.pop('attribute_matrix', None)
 
         # Generate a slug, if one was not specified or if the name has changed.
-        if not self.slug or self.name != original_product.name:
-            # Generate slug.
-            slug = slugify(self.name)
-            available_slug = slug
-
-            # Check whether the slug is available and regenerate if necessary.
-            slug_used, iterations = (bool(Product.objects.filter(slug=slug)), 1)
-            while slug_used:
-                iterations += 1
-                available_slug = slug + str(iterations)
-                slug_used = bool(Product.objects.filter(slug=available_slug))
-
-            self.slug = available_slug
+        if not self.slug or self.name != self._original_name:
+            self.slug = get_available_slug(self.name, exclude=self.pk)
 
         exclude = kwargs.pop('exclude', None)
         self.validate_unique(exclude)
@@ -184,13 +384,60 @@ class Product(TimeStampedModel):
             if not variants:
                 variant = Variant.objects.create(product=self, name=self.name)
 
+            # Keep the full SKUs of existing Variants in sync.
+            elif self.sku != self._original_sku:
+                Variant._base_manager.filter(
+                    product=self, sub_sku__gt=''
+                ).update(_sku=Upper(Func(
+                    Concat(Value(self.sku), F('sub_sku')),
+                    function='TRIM', output_field=models.CharField()
+                )))
+
+            self._original_name = self.name
+            self._original_sku = self.sku
+
             if variants.count() == 1 and self.name != variants[0].name:
                 variant = variants[0]
                 variant.name = self.name
                 variant.save(*args, **kwargs)
 
+            self.refresh_variant_index()
+
         return product
 
 
     def __str__(self):
         return self.name
+
+
+def refresh_variant_index(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+
+    if sender is Attribute:
+        # Attribute names are part of every combination key.
+        products = Product.objects.filter(
+            variant__attributevalue__attribute=instance
+        ).distinct()
+    else:
+        try:
+            product_id = (
+                instance.product_id if sender is Variant else
+                instance.variant.product_id
+            )
+        except Variant.DoesNotExist:
+            # The Variant is being deleted, which refreshes the index itself.
+            return
+
+        products = Product.objects.filter(pk=product_id)
+
+    for product in products:
+        product.refresh_variant_index()
+
+
+post_save.connect(refresh_variant_index, sender=Variant)
+post_delete.connect(refresh_variant_index, sender=Variant)
+post_save.connect(refresh_variant_index, sender=AttributeValue)
+post_delete.connect(refresh_variant_index, sender=AttributeValue)
+post_save.connect(refresh_variant_index, sender=Attribute)
+post_delete.connect(refresh_variant_index, sender=Attribute)
@@ -0,0 +1,223 @@
+import json
+import logging
+from django.db import models, transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from model_utils.models import TimeStampedModel
+from .Category import Category
+from .Image import Image
+from .Product import Product
+from .Variant import Variant
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+def serialize_product(product):
+    '''
+    Denormalize a Product (fetched via `ProductQuerySet.for_storefront`) into
+    the dict that is rendered within the storefront product grid.
+    '''
+    image = product.featured_image
+
+    return {
+        'id': product.pk,
+        'name': product.name,
+        'slug': product.slug,
+        'featured_image': image.crop['540x200'].url if image else None,
+        'minimum_price': product.minimum_price,
+        'maximum_price': product.maximum_price,
+        'variants': [
+            {'sku': variant.sku, 'name': variant.name,
+             'price': str(variant.price)}
+            for variant in product.variants
+        ],
+    }
+
+
+def get_snapshot_key(category=None):
+    '''
+    Return the unique key of the home page (or Category) snapshot. Unlike a
+    NULL category, the key of the home page snapshot is protected by a unique
+    constraint.
+    '''
+    return 'category:%s' % category.pk if category else 'home'
+
+
+# Create your models here.
+class SnapshotManager(models.Manager):
+
+    def get_products(self, category=None):
+        '''
+        Return the denormalized Products listed on the home page (or within a
+        Category), building the snapshot if it does not exist yet.
+        '''
+        try:
+            snapshot = self.get(key=get_snapshot_key(category))
+        except Snapshot.DoesNotExist:
+            snapshot = self.build(category=category)
+
+        return snapshot.products
+
+
+    def serialize(self, category=None):
+        '''
+        Denormalize the Products listed on the home page (or within a Category)
+        from scratch.
+        '''
+        products = (category.products if category else Product.objects)
+
+        return [
+            serialize_product(product) for product
+            in products.for_storefront().order_by('pk')
+        ]
+
+
+    def build(self, category=None):
+        '''
+        Rebuild the home page (or Category) snapshot from scratch.
+        '''
+        logger.info('Building storefront snapshot for %s...' %
+            (category or 'home page'))
+
+        data = self.serialize(category)
+        snapshot, created = self.update_or_create(
+            key=get_snapshot_key(category),
+            defaults={'category': category, 'data': json.dumps(data)}
+        )
+
+        logger.info('Built storefront snapshot for %s.' %
+            (category or 'home page'))
+
+        return snapshot
+
+
+    def refresh_product(self, product_id, category_ids=()):
+        '''
+        Replace the entry of a single Product within the snapshots that may
+        list it (the home page snapshot, the snapshots of its Categories, and
+        those of any Categories it was just removed from), rather than
+        rebuilding the snapshots from scratch.
+        '''
+        product = Product.objects.for_storefront().filter(pk=product_id).first()
+        entry = serialize_product(product) if product else None
+        current_category_ids = set(
+            Category.objects.filter(products=product_id).
+            values_list('pk', flat=True)
+        )
+        keys = [get_snapshot_key()] + [
+            'category:%s' % category_id for category_id
+            in current_category_ids.union(category_ids)
+        ]
+
+        with transaction.atomic():
+            for snapshot in self.select_for_update().filter(key__in=keys):
+                listed = bool(entry) and (
+                    snapshot.category_id is None or
+                    snapshot.category_id in current_category_ids
+                )
+
+                current_products = snapshot.products
+                products = [
+                    item for item in current_products
+                    if item['id'] != product_id
+                ]
+                if listed:
+                    products.append(entry)
+                    products.sort(key=lambda item: item['id'])
+
+                if products != current_products:
+                    snapshot.data = json.dumps(products)
+                    snapshot.save()
+
+
+class Snapshot(TimeStampedModel):
+    '''
+    A denormalized copy of the storefront product grid for the home page (when
+    `category` is NULL) or for a Category.
+    '''
+    key = models.CharField(
+        max_length=64, unique=True, null=False, blank=False, editable=False
+    )
+    category = models.OneToOneField(
+        'products.Category', null=True, blank=True, related_name='snapshot'
+    )
+    data = models.TextField(null=False, blank=False, default='[]')
+
+    objects = SnapshotManager()
+
+
+    @property
+    def products(self):
+        return json.loads(self.data)
+
+
+    @property
+    def stale(self):
+        '''
+        Determine whether the snapshot differs from the current catalog data.
+        Timestamps cannot tell, since they neither move on deletion nor tell
+        a change apart from a no-op save.
+        '''
+        data = json.dumps(Snapshot.objects.serialize(self.category))
+
+        return self.products != json.loads(data)
+
+
+    def __str__(self):
+        return 'Snapshot of %s' % (self.category or 'home page')
+
+
+def refresh_product_snapshots(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+
+    if sender is Product:
+        Snapshot.objects.refresh_product(
+            instance.pk, getattr(instance, '_snapshot_category_ids', ())
+        )
+    else:
+        Snapshot.objects.refresh_product(instance.product_id)
+
+
+def remember_product_categories(sender, instance, **kwargs):
+    # Category memberships are gone by the time a Product (or all of its
+    # Categories) has been removed, so remember the snapshots listing it.
+    instance._snapshot_category_ids = list(
+        instance.category_set.values_list('pk', flat=True)
+    )
+
+
+def refresh_category_snapshots(sender, instance, action, reverse, pk_set,
+    **kwargs):
+    if reverse and action == 'pre_clear':
+        remember_product_categories(Product, instance)
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # Categories of a Product changed.
+        category_ids = (
+            pk_set if action != 'post_clear' else
+            getattr(instance, '_snapshot_category_ids', ())
+        )
+        Snapshot.objects.refresh_product(instance.pk, category_ids)
+    elif action == 'post_clear':
+        Snapshot.objects.build(category=instance)
+    else:
+        # Products of a Category changed.
+        for product_id in pk_set:
+            Snapshot.objects.refresh_product(product_id, [instance.pk])
+
+
+pre_delete.connect(remember_product_categories, sender=Product)
+post_save.connect(refresh_product_snapshots, sender=Product)
+post_delete.connect(refresh_product_snapshots, sender=Product)
+post_save.connect(refresh_product_snapshots, sender=Variant)
+post_delete.connect(refresh_product_snapshots, sender=Variant)
+post_save.connect(refresh_product_snapshots, sender=Image)
+post_delete.connect(refresh_product_snapshots, sender=Image)
+m2m_changed.connect(
+    refresh_category_snapshots, sender=Category.products.through
+)
@@ -1,25 +1,30 @@
 import re
+import functools
 import importlib
 import logging
-from ast import literal_eval
 from collections import OrderedDict
-from datetime import datetime, timedelta
+from datetime import timedelta
 from decimal import Decimal, ROUND_CEILING
 from operator import itemgetter
 from random import random
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db import transaction
-from django.db.models import BooleanField, Case, Count, When
+from django.db.models import BooleanField, Case, Count, Q, When
+from django.db.models.signals import post_delete, post_save
 from django.utils import timezone
 from model_utils.models import TimeStampedModel
+from common.utils import call_concurrently
 from .Component import Component
 
 # Initialize logger.
 logger = logging.getLogger(__name__)
 
+FULFILLMENT_SETTINGS_CACHE_KEY = 'products.Variant.fulfillment_settings:%s'
+
 # Create your models here.
 class Attribute(TimeStampedModel):
 
@@ -74,7 +79,15 @@ class AttributeValue(TimeStampedModel):
         return self.attribute.name
 
 
+def normalize_sku(sku):
+    '''
+    Normalize a full SKU for case-insensitive, indexed lookups.
+    '''
+    return sku.strip().upper() if sku and sku.strip() else None
+
+
 class VariantManager(models.Manager):
+
     def get_queryset(self):
         queryset = super(VariantManager, self).get_queryset()
         queryset = queryset.annotate(
@@ -89,6 +102,23 @@ class VariantManager(models.Manager):
         return queryset
 
 
+    def get_by_sku(self, sku):
+        '''
+        Return the enabled Variant with the specified full SKU, or None. The
+        Variant is found through its (case-insensitively) unique, normalized
+        SKU, but is only returned if its SKU matches exactly.
+        '''
+        normalized_sku = normalize_sku(sku)
+        if not normalized_sku:
+            return None
+
+        variant = self.get_queryset().select_related('product').filter(
+            enabled=True, _sku=normalized_sku
+        ).first()
+
+        return variant if variant and variant.sku == sku else None
+
+
 class Variant(TimeStampedModel):
 
     product = models.ForeignKey('products.Product', null=False, blank=False)
@@ -108,11 +138,10 @@ class Variant(TimeStampedModel):
     _cost = models.DecimalField(
         max_digits=8, decimal_places=2, default=Decimal('0.00'),
         validators=[MinValueValidator(Decimal('0.00'))])
-    _cost_cache_expiration = models.DateTimeField(
-        timezone.make_aware(datetime.utcfromtimestamp(0)),
-        null=False,
-        blank=False)
+    _cost_cache_expiration = models.DateTimeField(null=True, blank=True)
     enabled = models.BooleanField(default=True)
+    _sku = models.CharField(
+        max_length=16, unique=True, null=True, blank=True, editable=False)
 
     objects = VariantManager()
 
@@ -129,49 +158,104 @@ class Variant(TimeStampedModel):
 
 
     def get_quote(self):
-
-        results = []
+        '''
+        Request quotes from the fulfillment backends of every supplier of the
+        Variant concurrently, returning the lowest quote received before the
+        per-backend timeout or overall deadline. The names of backends that
+        timed out are recorded in `quote_timeouts`.
+        '''
+        calls = []
+        suppliers = self.suppliers
         for api_name, supplier in settings.FULFILLMENT_BACKENDS:
-            if supplier not in self.suppliers:
+            if supplier not in suppliers:
                 continue
 
             try:
                 module = importlib.import_module(api_name)
-                logger.debug('Calling \'%s.get_quote\'...' % api_name)
-                result = module.get_quote(self)
-                logger.debug('Called \'%s.get_quote\'.' % api_name)
             except ImportError as e:
                 logger.critical('Unable to import module \'%s\'.' % api_name)
-            except KeyError as e:
+            else:
+                logger.debug('Calling \'%s.get_quote\'...' % api_name)
+                calls.append(
+                    (api_name, functools.partial(module.get_quote, self))
+                )
+
+        outcomes = call_concurrently(
+            calls,
+            timeout=getattr(settings, 'FULFILLMENT_QUOTE_TIMEOUT', None),
+            deadline=getattr(settings, 'FULFILLMENT_QUOTE_DEADLINE', None)
+        )
+
+        results = []
+        self.quote_timeouts = []
+        for api_name, outcome in outcomes.items():
+            if outcome.timed_out:
+                logger.warning(
+                    'Timed out after %.3fs waiting on \'%s.get_quote\'.' %
+                    (outcome.elapsed, api_name))
+                self.quote_timeouts.append(api_name)
+            elif outcome.error:
                 logger.critical(
-                    'KeyError within \'%s.get_quote\' backend: %s' %
-                    (api_name, e))
+                    '%s within \'%s.get_quote\' backend: %s' %
+                    (type(outcome.error).__name__, api_name, outcome.error))
             else:
-                results.append(result)
+                logger.debug(
+                    'Called \'%s.get_quote\' in %.3fs.' %
+                    (api_name, outcome.elapsed))
+                results.append(outcome.result)
 
         return min(results)
 
 
+    def calculate_cost(self):
+        '''
+        Compute the cost of the Variant from supplier quotes or, for Variants
+        manufactured in-house, from the FIFO cost of its Components.
+        '''
+        return (
+            Decimal(self.get_quote() if self.suppliers else
+                sum([component.quantity * component.inventory.fifo_cost
+                for component in self.components.all()])).
+            quantize(Decimal('1.00'), rounding=ROUND_CEILING))
+
+
+    def refresh_cost(self):
+        '''
+        Recompute and persist the cached cost of the Variant, scheduling the
+        next refresh between one and two days from now.
+        '''
+        self._cost = self.calculate_cost()
+        self._cost_cache_expiration = (
+            timezone.now() + timedelta(days=1, hours=24*random()))
+
+        # Bypass the annotating VariantManager, as well as save() and its
+        # signals, since only the cost cache has changed.
+        Variant._base_manager.filter(pk=self.pk).update(
+            _cost=self._cost,
+            _cost_cache_expiration=self._cost_cache_expiration
+        )
+
+        return self._cost
+
+
     @property
     def cost(self):
         '''
+        Return the cached cost of the Variant, or None if it has never been
+        calculated. Costs are calculated, and recomputed ahead of expiry, by
+        the \'refresh_costs\' management command, so reads never quote
+        suppliers or write to the database.
         '''
-        if self._cost_cache_expiration < timezone.now():
-            self._cost = (
-                Decimal(self.get_quote() if self.suppliers else
-                    sum([component.quantity * component.inventory.fifo_cost
-                    for component in self.components.all()])).
-                quantize(Decimal('1.00'), rounding=ROUND_CEILING))
-            self._cost_cache_expiration = (
-                timezone.now() + timedelta(days=1, hours=24*random()))
-            self.save()
+        if self._cost_cache_expiration is None:
+            return None
 
         return self._cost
 
 
     @property
     def margin(self):
-        return (self.price - self.cost)
+        cost = self.cost
+        return (self.price - cost) if cost is not None else None
 
 
     @property
@@ -179,18 +263,40 @@ class Variant(TimeStampedModel):
         '''
         Return a JSON-formatted dict of fulfillment settings.
         '''
+        cache_key = FULFILLMENT_SETTINGS_CACHE_KEY % self.pk
+        fulfillment_settings = cache.get(cache_key)
+
+        if fulfillment_settings is None:
+            fulfillment_settings = self.resolve_fulfillment_settings()
+            cache.set(
+                cache_key, fulfillment_settings,
+                settings.FULFILLMENT_SETTINGS_CACHE_TIMEOUT
+            )
+
+        return fulfillment_settings
+
+
+    def resolve_fulfillment_settings(self):
+        '''
+        Combine the default fulfillment settings of the Product with those of
+        the Variant, using a single query.
+        '''
+        from fulfillment.models import FulfillmentSettingValue
+
+        setting_values = FulfillmentSettingValue.objects.filter(
+            Q(product=self.product_id) | Q(variant=self.pk)
+        ).select_related('setting')
+
         defaults = {
-            setting.setting.name:literal_eval(setting.value)
-            for setting
-            in self.product.fulfillmentsettingvalue_set.all()
+            setting.setting.name:setting.parsed_value
+            for setting in setting_values if setting.product_id
         }
         json_settings = {
             k:v for k, v in defaults.items() if isinstance(v, dict)
         }
         defaults.update({
-            setting.setting.name:literal_eval(setting.value)
-            for setting
-            in self.fulfillmentsettingvalue_set.all()
+            setting.setting.name:setting.parsed_value
+            for setting in setting_values if setting.variant_id
         })
         combined_settings = [key for key in defaults if key in json_settings]
         for key in combined_settings:
@@ -200,6 +306,16 @@ class Variant(TimeStampedModel):
         return defaults
 
 
+    @staticmethod
+    def invalidate_fulfillment_settings(variant_pks):
+        '''
+        Discard the cached fulfillment settings of the specified Variants.
+        '''
+        cache.delete_many([
+            FULFILLMENT_SETTINGS_CACHE_KEY % pk for pk in variant_pks
+        ])
+
+
     @property
     def salable(self):
         return bool(self.sku.strip()) and self.enabled
@@ -237,9 +353,10 @@ class Variant(TimeStampedModel):
         return attributes
 
 
-    def validate_unique(self, *args, **kwargs):
-        from .Product import Product
-        super(Variant, self).validate_unique(*args, **kwargs)
+    def validate_unique(self, exclude=None):
+        # The normalized full SKU is validated below, at the catalog level.
+        exclude = list(exclude or []) + ['_sku']
+        super(Variant, self).validate_unique(exclude)
 
         validation_errors = {}
 
@@ -253,20 +370,16 @@ class Variant(TimeStampedModel):
             if sub_sku_queryset.exists():
                 validation_errors['sub_sku'] = ['Variant Sub-SKU for this Product already exists',]
 
-            similar_skus = [
-                product.sku + variant.sub_sku
-                for product in Product.objects.filter(
-                    sku__istartswith=self.product.sku[0]
-                ).exclude(pk=self.product.pk)
-                for variant in product.variant_set.filter(
-                    sub_sku__iendswith=self.sub_sku[-1]
-                )
-            ]
+            sku_queryset = self.__class__._default_manager.filter(
+                _sku=normalize_sku(self.sku)
+            )
+            if not self._state.adding and self.pk:
+                sku_queryset = sku_queryset.exclude(pk=self.pk)
 
-            if self.sku in similar_skus:
+            if sku_queryset.exists():
                 logger.error(
-                    'Variant SKU is not unique. SKU \'%s\' found in [%s].' %
-                    (self.sku, ', '.join(similar_skus))
+                    'Variant SKU is not unique. SKU \'%s\' already exists.' %
+                    self.sku
                 )
                 validation_errors['sub_sku'] = ['Product SKU and Variant Sub-SKU are not unique at the catalog level',]
 
@@ -286,6 +399,9 @@ class Variant(TimeStampedModel):
 
     def save(self, *args, **kwargs):
 
+        # Persist the normalized full SKU for indexed lookups.
+        self._sku = normalize_sku(self.sku)
+
         exclude = kwargs.pop('exclude', None)
         self.validate_unique(exclude)
 
@@ -321,3 +437,11 @@ class Variant(TimeStampedModel):
         return self.name or 'Variant(%s) of Product: %s' % (
             self.id, self.product.sku
         )
+
+
+def invalidate_fulfillment_settings(sender, instance, **kwargs):
+    Variant.invalidate_fulfillment_settings([instance.pk])
+
+
+post_save.connect(invalidate_fulfillment_settings, sender=Variant)
+post_delete.connect(invalidate_fulfillment_settings, sender=Variant)
@@ -1,5 +1,8 @@
 from .Category import Category
 from .Component import Component, ComponentManager
 from .Image import Image
-from .Product import Product, ProductManager
+from .Product import (
+    Product, ProductManager, ProductQuerySet, get_available_slug
+)
+from .Snapshot import Snapshot, SnapshotManager
 from .Variant import Attribute, AttributeValue, Variant
@@ -3,7 +3,9 @@ from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 from inventory.models import Inventory
-from ...models import Attribute, AttributeValue, Product, Variant, Component
+from ...models import (
+    Attribute, AttributeValue, Product, Variant, Component, get_available_slug
+)
 
 # Initialize logger.
 logger = logging.getLogger(__name__)
@@ -240,6 +242,118 @@ class ProductModelTest(TestCase):
         self.assertEqual(attributes, {'foo': ['bar']})
 
 
+    def test_attributes_property_is_built_with_a_single_query(self):
+        '''
+        Test that Product.attributes is built with a single query, regardless
+        of the number of Variants and attributes.
+        '''
+        product = Product.objects.create(name='foo', sku='123')
+        size = Attribute.objects.create(name='size')
+        color = Attribute.objects.create(name='color')
+        for i, (size_value, color_value) in enumerate(
+            [('S', 'red'), ('M', 'red'), ('S', 'blue'), ('M', 'blue')]):
+            variant = Variant.objects.create(product=product, name=str(i))
+            AttributeValue.objects.create(
+                variant=variant, attribute=size, value=size_value
+            )
+            AttributeValue.objects.create(
+                variant=variant, attribute=color, value=color_value
+            )
+
+        product = Product.objects.get(pk=product.pk)
+        with self.assertNumQueries(1):
+            attributes = product.attributes
+            attributes = product.attributes
+
+        self.assertEqual(
+            attributes, {'size': ['S', 'M'], 'color': ['red', 'blue']}
+        )
+
+
+    def test_product_gets_variant_by_attribute_combination(self):
+        '''
+        Test that Product.get_variant selects the Variant matching a
+        combination of attribute values, as provided by ProductOrderForm.
+        '''
+        product = Product.objects.create(name='foo', sku='123')
+        size = Attribute.objects.create(name='size')
+        color = Attribute.objects.create(name='color')
+        variant1 = Variant.objects.create(product=product, name='bar')
+        variant2 = Variant.objects.create(product=product, name='baz')
+        for variant, size_value in ((variant1, 'S'), (variant2, 'M')):
+            AttributeValue.objects.create(
+                variant=variant, attribute=size, value=size_value
+            )
+            AttributeValue.objects.create(
+                variant=variant, attribute=color, value='red'
+            )
+
+        product = Product.objects.get(pk=product.pk)
+
+        self.assertEqual(product.get_variant({'size': {'M'}}), variant2)
+        self.assertEqual(product.get_variant({'size': {'S'}}), variant1)
+        self.assertIsNone(product.get_variant({'size': {'L'}}))
+
+
+    def test_variant_index_is_rebuilt_when_attribute_values_change(self):
+        '''
+        Test that the Product's Variant index is rebuilt after an
+        AttributeValue changes.
+        '''
+        product = Product.objects.create(name='foo', sku='123')
+        size = Attribute.objects.create(name='size')
+        variant1 = Variant.objects.create(product=product, name='bar')
+        variant2 = Variant.objects.create(product=product, name='baz')
+        attribute_value1 = AttributeValue.objects.create(
+            variant=variant1, attribute=size, value='S'
+        )
+        attribute_value2 = AttributeValue.objects.create(
+            variant=variant2, attribute=size, value='M'
+        )
+
+        attribute_value2.value = 'L'
+        attribute_value2.save()
+
+        product = Product.objects.get(pk=product.pk)
+        self.assertIsNotNone(product._variant_index)
+        self.assertEqual(product.get_variant({'size': {'L'}}), variant2)
+
+
+    def test_variant_index_is_rebuilt_when_attribute_is_renamed(self):
+        '''
+        Test that the Product's Variant index is rebuilt after an Attribute is
+        renamed, since attribute names are part of each combination.
+        '''
+        product = Product.objects.create(name='foo', sku='123')
+        size = Attribute.objects.create(name='size')
+        variant1 = Variant.objects.create(product=product, name='bar')
+        variant2 = Variant.objects.create(product=product, name='baz')
+        for variant, size_value in ((variant1, 'S'), (variant2, 'M')):
+            AttributeValue.objects.create(
+                variant=variant, attribute=size, value=size_value
+            )
+
+        size.name = 'fit'
+        size.save()
+
+        product = Product.objects.get(pk=product.pk)
+        self.assertEqual(product.get_variant({'fit': {'M'}}), variant2)
+        self.assertIsNone(product.get_variant({'size': {'M'}}))
+
+
+    def test_variant_index_is_not_written_when_read(self):
+        '''
+        Test that reading the Variant index does not write to the database.
+        '''
+        product = Product.objects.create(name='foo', sku='123')
+        product = Product.objects.get(pk=product.pk)
+
+        with self.assertNumQueries(1):
+            variant = product.get_variant({})
+
+        self.assertEqual(variant, product.variant_set.get())
+
+
     def test_saving_to_and_retrieving_products_from_the_database(self):
         '''
         Test that a Product can be successfuly saved to the database.
@@ -387,3 +501,87 @@ class ProductModelTest(TestCase):
         variants = getattr(product, 'variants', None)
 
         self.assertEqual(variants, [variant, variant2, variant3])
+
+
+    def test_storefront_queryset_excludes_products_that_are_not_salable(self):
+        '''
+        Test that ProductQuerySet.for_storefront excludes Products without
+        salable Variants.
+        '''
+        product1 = Product.objects.create(sku='foo', name='foo')
+        product2 = Product.objects.create(sku='bar', name='bar')
+        variant = Variant.objects.create(
+            product=product2, name='baz', sub_sku='baz'
+        )
+
+        self.assertEqual(list(Product.objects.for_storefront()), [product2])
+
+
+    def test_storefront_queryset_prefetches_salable_variants_by_price(self):
+        '''
+        Test that ProductQuerySet.for_storefront provides salable Variants in
+        order of price without issuing additional queries.
+        '''
+        product = Product.objects.create(sku='foo', name='foo')
+        variant1 = Variant.objects.create(
+            product=product, name='bar', sub_sku='bar', price=Decimal(2.00)
+        )
+        variant2 = Variant.objects.create(
+            product=product, name='baz', sub_sku='baz', price=Decimal(1.00)
+        )
+        variant3 = Variant.objects.create(
+            product=product, name='qux', sub_sku='qux', enabled=False
+        )
+
+        product = Product.objects.for_storefront().get()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(product.variants, [variant2, variant1])
+            self.assertEqual(product.minimum_price, '$1.00')
+            self.assertEqual(product.maximum_price, '$2.00')
+            self.assertEqual([_.sku for _ in product.variants], ['foobaz', 'foobar'])
+
+
+    def test_model_generates_slug_from_name(self):
+        '''
+        Test that Product.slug is generated from Product.name.
+        '''
+        product = Product.objects.create(sku='foo', name='Foo Bar')
+        self.assertEqual(product.slug, 'foo-bar')
+
+
+    def test_model_appends_next_free_suffix_to_used_slug(self):
+        '''
+        Test that Product.slug receives the next free numeric suffix when the
+        slug generated from Product.name is already in use.
+        '''
+        product1 = Product.objects.create(sku='foo', name='Foo Bar')
+        product2 = Product.objects.create(sku='bar', name='Foo-Bar')
+        product3 = Product.objects.create(sku='baz', name='Foo  Bar')
+
+        self.assertEqual(
+            [product1.slug, product2.slug, product3.slug],
+            ['foo-bar', 'foo-bar2', 'foo-bar3']
+        )
+
+
+    def test_available_slug_is_found_with_a_single_query(self):
+        '''
+        Test that an available slug is found with a single query regardless of
+        the number of colliding slugs.
+        '''
+        for i in range(5):
+            Product.objects.create(sku='foo%s' % i, name='foo %s' % i,
+                slug='foo' + (str(i + 1) if i else ''))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_available_slug('foo'), 'foo6')
+
+
+    def test_available_slugs_can_be_reserved_for_bulk_import(self):
+        '''
+        Test that slugs allocated to unsaved Products are not allocated twice.
+        '''
+        allocated = set()
+        slugs = [get_available_slug('foo', allocated=allocated) for i in range(3)]
+        self.assertEqual(slugs, ['foo', 'foo2', 'foo3'])
@@ -0,0 +1,192 @@
+import logging
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from ...models import Category, Product, Snapshot, Variant
+
+try:
+    from unittest.mock import patch, PropertyMock
+except ImportError:
+    from mock import patch, PropertyMock
+
+# Initialize logger.
+logger = logging.getLogger(__name__)
+
+# Create your tests here.
+class SnapshotModelTest(TestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        self.product = Product.objects.create(name='foo', sku='foo')
+        self.variant = Variant.objects.create(
+            product=self.product, name='bar', sub_sku='bar',
+            price=Decimal(1.00)
+        )
+
+
+    def test_snapshot_is_built_on_first_read(self):
+        '''
+        Test that the home page snapshot is built when it is first read.
+        '''
+        products = Snapshot.objects.get_products()
+
+        self.assertEqual([_['name'] for _ in products], ['foo'])
+        self.assertTrue(Snapshot.objects.filter(category=None).exists())
+
+
+    def test_snapshot_is_read_with_a_single_query(self):
+        '''
+        Test that a built snapshot is read with a single query.
+        '''
+        Snapshot.objects.build()
+
+        with self.assertNumQueries(1):
+            products = Snapshot.objects.get_products()
+
+
+    def test_snapshot_is_updated_when_variant_is_saved(self):
+        '''
+        Test that a snapshot reflects Variant changes without being rebuilt.
+        '''
+        Snapshot.objects.build()
+
+        self.variant.price = Decimal(2.00)
+        self.variant.save()
+
+        product = Snapshot.objects.get_products()[0]
+        self.assertEqual(product['minimum_price'], '$2.00')
+        self.assertEqual(product['variants'][0]['sku'], 'foobar')
+
+
+    def test_snapshot_excludes_product_that_is_no_longer_salable(self):
+        '''
+        Test that a Product is removed from a snapshot when it is no longer
+        salable.
+        '''
+        Snapshot.objects.build()
+
+        self.variant.enabled = False
+        self.variant.save()
+
+        self.assertEqual(Snapshot.objects.get_products(), [])
+
+
+    def test_category_snapshot_is_updated_when_category_products_change(self):
+        '''
+        Test that a Category snapshot reflects changes to Category.products.
+        '''
+        category = Category.objects.create(name='baz', slug='baz')
+        Snapshot.objects.build(category=category)
+
+        category.products.add(self.product)
+        self.assertEqual(
+            [_['name'] for _ in Snapshot.objects.get_products(category)],
+            ['foo']
+        )
+
+        category.products.remove(self.product)
+        self.assertEqual(Snapshot.objects.get_products(category), [])
+
+
+    def test_snapshot_is_not_stale_after_incremental_update(self):
+        '''
+        Test that a snapshot is not reported as stale after it has been
+        updated incrementally.
+        '''
+        snapshot = Snapshot.objects.build()
+
+        self.variant.price = Decimal(2.00)
+        self.variant.save()
+
+        snapshot = Snapshot.objects.get(category=None)
+        self.assertFalse(snapshot.stale)
+
+
+    def test_only_one_home_page_snapshot_can_exist(self):
+        '''
+        Test that the database rejects a second home page snapshot, as would
+        be created by concurrent builds.
+        '''
+        Snapshot.objects.build()
+
+        with transaction.atomic():
+            self.assertRaises(
+                IntegrityError, Snapshot.objects.create, key='home'
+            )
+        self.assertEqual(Snapshot.objects.get_products()[0]['name'], 'foo')
+
+
+    def test_only_snapshots_listing_product_are_refreshed(self):
+        '''
+        Test that saving a Variant only refreshes the snapshots that may list
+        its Product.
+        '''
+        category = Category.objects.create(name='baz', slug='baz')
+        Snapshot.objects.build()
+        Snapshot.objects.build(category=category)
+
+        with patch.object(
+            Snapshot, 'products', new_callable=PropertyMock, return_value=[]
+        ) as products:
+            self.variant.save()
+
+        self.assertEqual(products.call_count, 1)
+
+
+    def test_category_snapshot_is_updated_when_product_is_deleted(self):
+        '''
+        Test that a Category snapshot no longer lists a deleted Product.
+        '''
+        category = Category.objects.create(name='baz', slug='baz')
+        category.products.add(self.product)
+        Snapshot.objects.build(category=category)
+
+        self.product.delete()
+
+        self.assertEqual(Snapshot.objects.get_products(category), [])
+
+
+    def test_category_snapshot_is_updated_when_product_categories_are_cleared(
+        self):
+        '''
+        Test that a Category snapshot no longer lists a Product whose
+        Categories were cleared.
+        '''
+        category = Category.objects.create(name='baz', slug='baz')
+        category.products.add(self.product)
+        Snapshot.objects.build(category=category)
+
+        self.product.category_set.clear()
+
+        self.assertEqual(Snapshot.objects.get_products(category), [])
+
+
+    def test_snapshot_is_not_stale_after_no_op_save(self):
+        '''
+        Test that a snapshot is not reported as stale after catalog data has
+        been saved without changes.
+        '''
+        Snapshot.objects.build()
+
+        self.product.save()
+        self.variant.save()
+
+        snapshot = Snapshot.objects.get(category=None)
+        self.assertFalse(snapshot.stale)
+
+
+    def test_snapshot_is_stale_after_unsignalled_deletion(self):
+        '''
+        Test that a snapshot is reported as stale once a Product it lists has
+        been removed without updating it.
+        '''
+        category = Category.objects.create(name='baz', slug='baz')
+        category.products.add(self.product)
+        Snapshot.objects.build(category=category)
+
+        Category.products.through.objects.filter(category=category).delete()
+
+        snapshot = Snapshot.objects.get(category=category)
+        self.assertTrue(snapshot.stale)
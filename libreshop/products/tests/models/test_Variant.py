@@ -1,16 +1,31 @@
 import logging
+import sys
+import threading
 from django.core.exceptions import ValidationError
 from decimal import Decimal
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from inventory.models import Inventory
 from fulfillment.models import (
     FulfillmentSetting, FulfillmentSettingValue, Supplier
 )
 from ...models import Attribute, AttributeValue, Product, Variant, Component
 
+try:
+    from unittest.mock import patch, PropertyMock
+except ImportError:
+    from mock import patch, PropertyMock
+
 # Initialize logger.
 logger = logging.getLogger(__name__)
 
+STUB_BACKENDS = [
+    ('fulfillment.tests.backends.fast', 'Fast'),
+    ('fulfillment.tests.backends.slow', 'Slow'),
+    ('fulfillment.tests.backends.broken', 'Broken'),
+]
+
 # Create your tests here.
 class VariantModelTest(TestCase):
 
@@ -242,6 +257,35 @@ class VariantModelTest(TestCase):
         )
 
 
+    def test_model_catalog_level_sku_check_does_not_grow_with_catalog_size(self):
+        '''
+        Test that saving a Variant issues the same number of queries regardless
+        of the number of similar SKUs within the catalog.
+        '''
+        def create_products(count, offset=0):
+            for i in range(offset, offset + count):
+                product = Product.objects.create(name='p%s' % i, sku='1%s' % i)
+                Variant.objects.create(product=product, name='v', sub_sku='x9')
+
+        product = Product.objects.create(name='foo', sku='1')
+        variant = Variant.objects.create(
+            product=product, name='bar', sub_sku='9'
+        )
+
+        create_products(2)
+        with CaptureQueriesContext(connection) as small_catalog:
+            variant.save()
+
+        create_products(20, offset=2)
+        with CaptureQueriesContext(connection) as large_catalog:
+            variant.save()
+
+        self.assertEqual(
+            len(small_catalog.captured_queries),
+            len(large_catalog.captured_queries)
+        )
+
+
     def test_different_products_can_have_same_variant_name(self):
         '''
         Test that two Variants of two distinct Products can have the same
@@ -372,6 +416,24 @@ class VariantModelTest(TestCase):
             sub_sku='Foo')
 
 
+    def test_model_full_sku_is_unique_within_product_regardless_of_character_case(self):
+        '''
+        Test that Variants of the same Product whose full SKUs only differ in
+        character case (or surrounding whitespace) fail validation, rather
+        than violating the unique normalized SKU.
+        '''
+        product = Product.objects.create(sku='foo', name='foo')
+        Variant.objects.create(product=product, name='bar', sub_sku='a')
+        variant = Variant.objects.create(product=product, name='baz', sub_sku='b')
+
+        for sub_sku in ('A', 'a '):
+            variant.sub_sku = sub_sku
+
+            with self.assertRaises(ValidationError) as context:
+                variant.save()
+            self.assertIn('sub_sku', context.exception.message_dict)
+
+
     def test_model_product_and_sub_sku_fields_do_not_invalidate_self_on_subsequent_save(self):
         '''
         Test that Variant.product and Variant.sub_sku does not cause the Variant
@@ -678,3 +740,271 @@ class VariantModelTest(TestCase):
         variant.delete()
         variant = Variant.objects.filter(product=product)[0]
         self.assertNotEqual(original_variant_id, variant.id)
+
+
+    def test_model_persists_normalized_full_sku(self):
+        '''
+        Test that Variant._sku is a normalized copy of Variant.sku.
+        '''
+        product = Product.objects.create(name='foo', sku='abc')
+        variant = Variant.objects.create(
+            product=product, name='bar', sub_sku='def'
+        )
+
+        self.assertEqual(Variant.objects.get(pk=variant.pk)._sku, 'ABCDEF')
+
+
+    def test_model_full_sku_follows_product_sku(self):
+        '''
+        Test that Variant._sku is updated when Variant.product.sku changes.
+        '''
+        product = Product.objects.create(name='foo', sku='abc')
+        variant = Variant.objects.create(
+            product=product, name='bar', sub_sku='def'
+        )
+
+        product.sku = 'xyz'
+        product.save()
+
+        self.assertEqual(Variant.objects.get(pk=variant.pk)._sku, 'XYZDEF')
+
+
+    def test_model_full_skus_follow_product_sku_with_a_single_update(self):
+        '''
+        Test that the full SKUs of all Variants of a Product are updated with a
+        single query when Variant.product.sku changes.
+        '''
+        product = Product.objects.create(name='foo', sku='abc')
+        for sub_sku in ('def', 'ghi', 'jkl'):
+            Variant.objects.create(
+                product=product, name=sub_sku, sub_sku=sub_sku
+            )
+
+        product.sku = 'xyz'
+        with CaptureQueriesContext(connection) as context:
+            product.save()
+
+        updates = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "products_variant"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            sorted(Variant.objects.filter(_sku__isnull=False).
+                values_list('_sku', flat=True)),
+            ['XYZDEF', 'XYZGHI', 'XYZJKL']
+        )
+
+
+    def test_product_sku_cannot_make_variant_skus_collide(self):
+        '''
+        Test that a Product SKU change is rejected when it would make the full
+        SKU of one of its Variants collide with that of another Product.
+        '''
+        product1 = Product.objects.create(name='foo', sku='AB')
+        Variant.objects.create(product=product1, name='bar', sub_sku='CD')
+        product2 = Product.objects.create(name='baz', sku='XYZ')
+        Variant.objects.create(product=product2, name='qux', sub_sku='D')
+
+        product2.sku = 'ABC'
+
+        self.assertRaises(ValidationError, product2.save)
+        self.assertEqual(
+            Variant.objects.get(product=product2, sub_sku='D')._sku, 'XYZD'
+        )
+
+
+    def test_manager_gets_enabled_variant_by_sku_with_one_query(self):
+        '''
+        Test that VariantManager.get_by_sku resolves a full SKU with a single
+        query.
+        '''
+        product = Product.objects.create(name='foo', sku='abc')
+        variant = Variant.objects.create(
+            product=product, name='bar', sub_sku='def'
+        )
+
+        with self.assertNumQueries(1):
+            self.assertEqual(Variant.objects.get_by_sku('abcdef'), variant)
+
+
+    def test_manager_gets_variant_by_sku_with_matching_character_case(self):
+        '''
+        Test that VariantManager.get_by_sku only resolves a full SKU that
+        matches the Variant SKU exactly, including its character case.
+        '''
+        product = Product.objects.create(name='foo', sku='abc')
+        variant = Variant.objects.create(
+            product=product, name='bar', sub_sku='def'
+        )
+
+        self.assertIsNone(Variant.objects.get_by_sku('ABCDEF'))
+        self.assertIsNone(Variant.objects.get_by_sku('abcDEF'))
+
+
+    def test_manager_does_not_get_variant_by_stale_sku(self):
+        '''
+        Test that VariantManager.get_by_sku does not return a Variant whose SKU
+        has changed since it was last looked up.
+        '''
+        product = Product.objects.create(name='foo', sku='abc')
+        variant = Variant.objects.create(
+            product=product, name='bar', sub_sku='def'
+        )
+        Variant.objects.get_by_sku('abcdef')
+
+        variant.sub_sku = 'ghi'
+        variant.save()
+
+        self.assertIsNone(Variant.objects.get_by_sku('abcdef'))
+        self.assertEqual(Variant.objects.get_by_sku('abcghi'), variant)
+
+
+    def test_model_caches_resolved_fulfillment_settings(self):
+        '''
+        Test that Variant.fulfillment_settings are resolved with a single query
+        and then served from the cache.
+        '''
+        product = Product.objects.create(name='foo', sku='123')
+        variant = Variant.objects.create(
+            product=product, name='bar', sub_sku='456'
+        )
+        supplier = Supplier.objects.create(
+            name='foo',
+            fulfillment_backend='django.core.mail.backends.locmem.EmailBackend'
+        )
+        setting = FulfillmentSetting.objects.create(
+            supplier=supplier, name='setting'
+        )
+        default_setting_value = FulfillmentSettingValue.objects.create(
+            setting=setting, product=product, value="{'foo': 'bar'}"
+        )
+
+        with self.assertNumQueries(1):
+            fulfillment_settings = variant.fulfillment_settings
+        with self.assertNumQueries(0):
+            fulfillment_settings = variant.fulfillment_settings
+
+        self.assertEqual(fulfillment_settings, {'setting': {'foo': 'bar'}})
+
+
+    def test_model_cached_fulfillment_settings_are_invalidated(self):
+        '''
+        Test that cached Variant.fulfillment_settings are discarded when a
+        FulfillmentSettingValue changes.
+        '''
+        product = Product.objects.create(name='foo', sku='123')
+        variant = Variant.objects.create(
+            product=product, name='bar', sub_sku='456'
+        )
+        supplier = Supplier.objects.create(
+            name='foo',
+            fulfillment_backend='django.core.mail.backends.locmem.EmailBackend'
+        )
+        setting = FulfillmentSetting.objects.create(
+            supplier=supplier, name='setting'
+        )
+        default_setting_value = FulfillmentSettingValue.objects.create(
+            setting=setting, product=product, value="'foo'"
+        )
+        fulfillment_settings = variant.fulfillment_settings
+
+        default_setting_value.value = "'bar'"
+        default_setting_value.save()
+
+        self.assertEqual(variant.fulfillment_settings, {'setting': 'bar'})
+
+
+    @override_settings(FULFILLMENT_SETTINGS_CACHE_TIMEOUT=60)
+    def test_model_caches_fulfillment_settings_for_a_limited_time(self):
+        '''
+        Test that Variant.fulfillment_settings are cached only for the
+        configured number of seconds, so that changes made in other processes
+        are eventually seen.
+        '''
+        product = Product.objects.create(name='foo', sku='123')
+        variant = Variant.objects.create(
+            product=product, name='bar', sub_sku='456'
+        )
+
+        module = sys.modules[Variant.__module__]
+        with patch.object(module, 'cache') as cache:
+            cache.get.return_value = None
+            fulfillment_settings = variant.fulfillment_settings
+
+        cache.set.assert_called_once_with(
+            'products.Variant.fulfillment_settings:%s' % variant.pk, {}, 60
+        )
+
+
+@override_settings(
+    FULFILLMENT_BACKENDS=STUB_BACKENDS,
+    FULFILLMENT_QUOTE_TIMEOUT=0.2,
+    FULFILLMENT_QUOTE_DEADLINE=1
+)
+@patch.object(
+    Variant, 'suppliers', new_callable=PropertyMock,
+    return_value=['Fast', 'Slow', 'Broken']
+)
+class VariantQuoteTest(TestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        product = Product.objects.create(name='foo', sku='123')
+        self.variant = Variant.objects.create(
+            product=product, name='bar', sub_sku='456'
+        )
+
+
+    def test_get_quote_returns_best_quote_received_in_time(self, suppliers):
+        '''
+        Test that Variant.get_quote returns the lowest quote received before
+        the per-backend timeout, and records the backends that timed out.
+        '''
+        quote = self.variant.get_quote()
+
+        self.assertEqual(quote, Decimal('2.00'))
+        self.assertEqual(
+            self.variant.quote_timeouts, ['fulfillment.tests.backends.slow']
+        )
+
+
+    def test_get_quote_calls_backends_concurrently(self, suppliers):
+        '''
+        Test that Variant.get_quote calls backends concurrently, by making
+        each backend wait until the other one has been called as well.
+        '''
+        barrier = threading.Barrier(2, timeout=5)
+        with patch('fulfillment.tests.backends.fast.BARRIER', barrier), \
+            patch('fulfillment.tests.backends.slow.BARRIER', barrier), \
+            patch('fulfillment.tests.backends.slow.DELAY', 0), \
+            self.settings(
+                FULFILLMENT_QUOTE_TIMEOUT=10, FULFILLMENT_QUOTE_DEADLINE=10
+            ):
+            quote = self.variant.get_quote()
+
+        self.assertEqual(quote, Decimal('1.00'))
+        self.assertEqual(self.variant.quote_timeouts, [])
+        self.assertFalse(barrier.broken)
+
+
+    def test_get_quote_honors_per_backend_timeouts(self, suppliers):
+        '''
+        Test that Variant.get_quote applies timeouts configured per backend,
+        bounded by the overall deadline.
+        '''
+        timeouts = {
+            'fulfillment.tests.backends.fast': 0.05,
+            'fulfillment.tests.backends.slow': 5,
+        }
+        with patch('fulfillment.tests.backends.fast.DELAY', 0.3), \
+            patch('fulfillment.tests.backends.slow.DELAY', 0.1), \
+            self.settings(FULFILLMENT_QUOTE_TIMEOUT=timeouts):
+            quote = self.variant.get_quote()
+
+        self.assertEqual(quote, Decimal('1.00'))
+        self.assertEqual(
+            self.variant.quote_timeouts, ['fulfillment.tests.backends.fast']
+        )
@@ -1,5 +1,9 @@
+from decimal import Decimal
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from ..models import Product, Variant
 
 
 class HomePageViewTest(TestCase):
@@ -11,10 +15,48 @@ class HomePageViewTest(TestCase):
         self.view_url = reverse('products:home')
 
 
+    def create_products(self, count, offset=0):
+        '''
+        Create a number of salable Products, each having two Variants.
+        '''
+        for i in range(offset, offset + count):
+            product = Product.objects.create(name='foo%s' % i, sku='%s' % i)
+            Variant.objects.create(
+                product=product, name='bar', sub_sku='1', price=Decimal(1.00)
+            )
+            Variant.objects.create(
+                product=product, name='baz', sub_sku='2', price=Decimal(2.00)
+            )
+
+
     def test_view_returns_200_status(self):
         '''
         Test that the View returns a 200 OK status when it receives an HTTP GET
         request.
         '''
         response = self.client.get(self.view_url)
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+
+    def test_view_query_count_does_not_grow_with_catalog_size(self):
+        '''
+        Test that the View issues the same number of queries regardless of the
+        number of Products in the catalog.
+        '''
+        self.create_products(2)
+
+        # Build the storefront snapshot before measuring.
+        response = self.client.get(self.view_url)
+
+        with CaptureQueriesContext(connection) as small_catalog:
+            response = self.client.get(self.view_url)
+
+        self.create_products(10, offset=2)
+        with CaptureQueriesContext(connection) as large_catalog:
+            response = self.client.get(self.view_url)
+
+        self.assertEqual(len(response.context['products']), 12)
+        self.assertEqual(
+            len(small_catalog.captured_queries),
+            len(large_catalog.captured_queries)
+        )
@@ -1,3 +1,5 @@
+import json
+from decimal import Decimal
 from importlib import import_module
 from django.http import HttpRequest
 from django.conf import settings
@@ -7,7 +9,7 @@ from django.template.response import TemplateResponse
 from django.test import TestCase, RequestFactory
 from carts.utils import SessionList
 from ..forms import ProductOrderForm
-from ..models import Product, Variant
+from ..models import Attribute, AttributeValue, Product, Variant
 from ..views import ProductView
 
 
@@ -124,7 +126,7 @@ class ProductViewTest(TestCase):
         cart = SessionList(request.session)
         variant_id = product.variant_set.first().id
 
-        self.assertIn(variant_id, cart)
+        self.assertIn([variant_id, 1], cart)
 
 
     def test_view_context_cart_is_a_list(self):
@@ -175,3 +177,35 @@ class ProductViewTest(TestCase):
         rendered_html = response.content.decode()
 
         self.assertIn(description, rendered_html)
+
+
+    def test_view_embeds_variant_map_in_template(self):
+        '''
+        Test that the view embeds a map of attribute combinations to Variant
+        SKUs, prices and salability within its template.
+        '''
+        product = Product.objects.create(name='foo', sku='1000')
+        size = Attribute.objects.create(name='size')
+        variant1 = Variant.objects.create(
+            product=product, name='bar', sub_sku='S', price=Decimal(1.00)
+        )
+        variant2 = Variant.objects.create(
+            product=product, name='baz', sub_sku='M', price=Decimal(2.00)
+        )
+        AttributeValue.objects.create(
+            variant=variant1, attribute=size, value='S'
+        )
+        AttributeValue.objects.create(
+            variant=variant2, attribute=size, value='M'
+        )
+
+        response = self.client.get(
+            reverse('products:product', kwargs={'slug': 'foo'})
+        )
+        variant_map = json.loads(response.context['variant_map'])
+
+        self.assertEqual(
+            variant_map['[["size","M"]]'],
+            {'sku': '1000M', 'price': '2.00', 'salable': True}
+        )
+        self.assertIn(response.context['variant_map'], response.content.decode())
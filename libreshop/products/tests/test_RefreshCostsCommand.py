@@ -0,0 +1,160 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.six import StringIO
+from ..models import Product, Variant
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+class RefreshCostsCommandTest(TestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        # Set up string buffer to capture command output.
+        self.output = StringIO()
+
+        # Set up test data. Every Variant, including the default Variant of
+        # the Product, has a fresh cost except for `expiring_variant`.
+        product = Product.objects.create(name='foo', sku='123')
+        self.expiring_variant = Variant.objects.create(
+            product=product, name='bar', sub_sku='456'
+        )
+        self.fresh_variant = Variant.objects.create(
+            product=product, name='baz', sub_sku='789'
+        )
+        Variant._base_manager.update(
+            _cost=Decimal('5.00'),
+            _cost_cache_expiration=timezone.now() + timedelta(days=1)
+        )
+        Variant._base_manager.filter(pk=self.expiring_variant.pk).update(
+            _cost=Decimal('0.00'),
+            _cost_cache_expiration=timezone.now() - timedelta(minutes=1)
+        )
+
+
+    def test_reading_cost_does_not_query_the_database(self):
+        '''
+        Test that Variant.cost returns the cached cost without quoting
+        suppliers or writing to the database, even once it has expired.
+        '''
+        variant = Variant.objects.get(pk=self.expiring_variant.pk)
+
+        with patch.object(Variant, 'calculate_cost') as calculate_cost:
+            with self.assertNumQueries(0):
+                cost = variant.cost
+
+        self.assertEqual(cost, Decimal('0.00'))
+        self.assertFalse(calculate_cost.called)
+
+
+    def test_reading_uncached_cost_does_not_calculate_it(self):
+        '''
+        Test that Variant.cost reports an unknown (None) cost for a Variant
+        whose cost has never been cached, without quoting suppliers or
+        writing to the database.
+        '''
+        Variant._base_manager.filter(pk=self.expiring_variant.pk).update(
+            _cost_cache_expiration=None
+        )
+        variant = Variant.objects.get(pk=self.expiring_variant.pk)
+
+        with patch.object(Variant, 'calculate_cost') as calculate_cost:
+            with self.assertNumQueries(0):
+                cost = variant.cost
+                margin = variant.margin
+
+        self.assertIsNone(cost)
+        self.assertIsNone(margin)
+        self.assertFalse(calculate_cost.called)
+
+
+    def test_command_refreshes_uncached_costs(self):
+        '''
+        Test that `./manage.py refresh_costs` calculates costs that have never
+        been cached.
+        '''
+        Variant._base_manager.filter(pk=self.fresh_variant.pk).update(
+            _cost_cache_expiration=None
+        )
+
+        with patch.object(
+            Variant, 'calculate_cost', return_value=Decimal('2.50')
+        ) as calculate_cost:
+            call_command('refresh_costs', stdout=self.output)
+
+        self.assertEqual(calculate_cost.call_count, 2)
+        self.assertIn('Refreshed 2 Variant cost(s).', self.output.getvalue())
+
+
+    def test_command_refreshes_expiring_costs(self):
+        '''
+        Test that `./manage.py refresh_costs` recomputes costs that expire
+        within the look-ahead window and leaves the others untouched.
+        '''
+        with patch.object(
+            Variant, 'calculate_cost', return_value=Decimal('2.50')
+        ) as calculate_cost:
+            call_command('refresh_costs', stdout=self.output)
+
+        expiring_variant = Variant.objects.get(pk=self.expiring_variant.pk)
+        fresh_variant = Variant.objects.get(pk=self.fresh_variant.pk)
+
+        self.assertEqual(calculate_cost.call_count, 1)
+        self.assertEqual(expiring_variant.cost, Decimal('2.50'))
+        self.assertGreater(
+            expiring_variant._cost_cache_expiration,
+            timezone.now() + timedelta(days=1) - timedelta(minutes=1)
+        )
+        self.assertEqual(fresh_variant.cost, Decimal('5.00'))
+        self.assertIn('Refreshed 1 Variant cost(s).', self.output.getvalue())
+
+
+    def test_command_refreshes_costs_ahead_of_expiry(self):
+        '''
+        Test that `./manage.py refresh_costs --ahead` recomputes costs before
+        they expire.
+        '''
+        with patch.object(
+            Variant, 'calculate_cost', return_value=Decimal('2.50')
+        ) as calculate_cost:
+            call_command(
+                'refresh_costs', stdout=self.output, ahead=2*24*60,
+                batch_size=1
+            )
+
+        self.assertEqual(
+            calculate_cost.call_count, Variant._base_manager.count()
+        )
+        self.assertEqual(
+            Variant.objects.get(pk=self.fresh_variant.pk).cost,
+            Decimal('2.50')
+        )
+
+
+    def test_command_keeps_stale_cost_when_refresh_fails(self):
+        '''
+        Test that `./manage.py refresh_costs` keeps serving the stale cost of
+        a Variant whose supplier quote fails, and reports the failure.
+        '''
+        with patch.object(
+            Variant, 'calculate_cost', side_effect=ValueError('no quote')
+        ):
+            call_command('refresh_costs', stdout=self.output)
+
+        expiring_variant = Variant.objects.get(pk=self.expiring_variant.pk)
+
+        self.assertEqual(expiring_variant.cost, Decimal('0.00'))
+        self.assertLess(
+            expiring_variant._cost_cache_expiration, timezone.now()
+        )
+        self.assertIn(
+            'Unable to refresh 1 Variant cost(s).', self.output.getvalue()
+        )
@@ -0,0 +1,45 @@
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+from ..models import Product, Snapshot, Variant
+
+
+class SnapshotCommandTest(TestCase):
+
+    def setUp(self):
+        '''
+        Create common test assets prior to each individual unit test run.
+        '''
+        # Set up string buffer to capture command output.
+        self.output = StringIO()
+
+        # Set up test data.
+        product = Product.objects.create(name='foo', sku='123')
+        variant = Variant.objects.create(
+            product=product, name='bar', sub_sku='456'
+        )
+
+
+    def test_command_reports_snapshots_that_have_not_been_built(self):
+        '''
+        Test that `./manage.py snapshot --check` reports missing snapshots
+        without building them.
+        '''
+        call_command('snapshot', stdout=self.output, check=True)
+
+        expected_output = 'Snapshot of home page has not been built.'
+        self.assertIn(expected_output, self.output.getvalue())
+        self.assertFalse(Snapshot.objects.exists())
+
+
+    def test_command_rebuilds_snapshots(self):
+        '''
+        Test that `./manage.py snapshot` rebuilds snapshots from scratch.
+        '''
+        call_command('snapshot', stdout=self.output)
+
+        expected_output = 'Rebuilt snapshot of home page.'
+        self.assertIn(expected_output, self.output.getvalue())
+        self.assertEqual(
+            [_['name'] for _ in Snapshot.objects.get_products()], ['foo']
+        )
@@ -1,10 +1,11 @@
+import json
 import logging
 from django.forms import Form
 from django.views.generic import FormView, TemplateView
 from django.shortcuts import redirect
 from carts.utils import SessionCart
 from .forms import ProductOrderForm
-from .models import Category, Product, Variant
+from .models import Category, Product, Snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -19,9 +20,7 @@ class HomePageView(TemplateView):
         cart = SessionCart(self.request.session)
 
         context.update({
-            'products': [
-                product for product in Product.objects.all() if product.salable
-            ],
+            'products': Snapshot.objects.get_products(),
             'cart': cart
         })
 
@@ -53,10 +52,7 @@ class CategoryView(TemplateView):
         cart = SessionCart(self.request.session)
 
         context.update({
-            'products': [
-                product
-                for product in self.category.products.all() if product.salable
-            ],
+            'products': Snapshot.objects.get_products(self.category),
             'cart': cart
         })
 
@@ -101,17 +97,10 @@ class ProductView(FormView):
 
         cart = SessionCart(self.request.session)
 
-        variants = Variant.objects.filter(product=self.product)
-        for variant in variants:
-            relevant_attributes = {
-                key:variant.attributes[key]
-                for key in variant.attributes
-                if key in form.cleaned_data
-            }
-            if relevant_attributes == form.cleaned_data:
-                logger.info('User selected "%s"' % variant)
-                cart.add(variant)
-                break
+        variant = self.product.get_variant(form.cleaned_data)
+        if variant:
+            logger.info('User selected "%s"' % variant)
+            cart.add(variant)
 
         return super(ProductView, self).form_valid(form)
 
@@ -121,8 +110,18 @@ class ProductView(FormView):
 
         cart = SessionCart(self.request.session)
 
+        variant_map = json.dumps({})
+        if self.product:
+            # Escape characters that would allow the JSON to break out of the
+            # <script> element it is embedded within.
+            variant_map = json.dumps(self.product.variant_map)
+            for character, escape_sequence in (
+                ('<', '\\u003c'), ('>', '\\u003e'), ('&', '\\u0026')):
+                variant_map = variant_map.replace(character, escape_sequence)
+
         context.update({
             'product': self.product,
+            'variant_map': variant_map,
             'cart': cart
         })
 